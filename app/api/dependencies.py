@@ -1,13 +1,20 @@
 from typing import Annotated
 from uuid import UUID
 
-from fastapi import BackgroundTasks, Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Request, status
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.core.exceptions import ClientNotAuthorized
-from app.core.security import oauth2_scheme_seller, oauth2_scheme_partner
+from app.config import security_settings
+from app.core.exceptions import ClientNotAuthorized, TooManyRequests
+from app.core.security import (
+    PartnerPrincipal,
+    SellerPrincipal,
+    oauth2_scheme_seller,
+    oauth2_scheme_partner,
+)
 from app.database.models import DeliveryPartner, Seller
-from app.database.redis import is_jti_blacklisted
+from app.database.principal import principal_cache
+from app.database.redis import hit_rate_limits, is_jti_blacklisted
 from app.database.session import get_session
 from app.services.deliver_partner import DeliveryPartnerService
 from app.services.seller import SellerService
@@ -47,26 +54,83 @@ async def get_delivery_partner_access_token(
 async def get_current_seller(
     token_data: Annotated[dict, Depends(get_seller_access_token)],
     session: SessionDep,
-):
-    seller = await session.get(Seller, UUID(token_data["user"]["id"]))
+) -> SellerPrincipal:
+    seller = await principal_cache.get(
+        session, Seller, SellerPrincipal, UUID(token_data["user"]["id"])
+    )
 
     if seller is None:
         raise ClientNotAuthorized
     return seller
 
 
-# Logged In Seller
+# Logged In Delivery Partner
 async def get_current_partner(
     token_data: Annotated[dict, Depends(get_delivery_partner_access_token)],
     session: SessionDep,
-):
-    partner = await session.get(DeliveryPartner, UUID(token_data["user"]["id"]))
+) -> PartnerPrincipal:
+    partner = await principal_cache.get(
+        session,
+        DeliveryPartner,
+        PartnerPrincipal,
+        UUID(token_data["user"]["id"]),
+    )
 
     if partner is None:
         raise ClientNotAuthorized
     return partner
 
 
+# Email a request is made for, from the query, login form or json body
+async def _get_request_email(request: Request) -> str | None:
+    email = request.query_params.get("email")
+    content_type = request.headers.get("content-type", "")
+
+    if email is None and content_type.startswith(
+        ("application/x-www-form-urlencoded", "multipart/form-data")
+    ):
+        email = (await request.form()).get("username")
+    elif email is None and content_type.startswith("application/json"):
+        body = await request.json()
+        email = body.get("email") if isinstance(body, dict) else None
+
+    return email.lower() if isinstance(email, str) else None
+
+
+# Rate limit dep, per client ip and per email over a sliding window
+class RateLimit:
+    def __init__(
+        self,
+        scope: str,
+        per_ip: int | None = None,
+        per_email: int | None = None,
+        window: int = security_settings.RATE_LIMIT_WINDOW,
+    ):
+        self.scope = scope
+        self.per_ip = per_ip
+        self.per_email = per_email
+        self.window = window
+
+    async def __call__(self, request: Request):
+        limits = []
+
+        if self.per_ip and request.client:
+            limits.append(
+                (f"rate_limit:{self.scope}:ip:{request.client.host}", self.per_ip)
+            )
+
+        if self.per_email and (email := await _get_request_email(request)):
+            limits.append((f"rate_limit:{self.scope}:email:{email}", self.per_email))
+
+        if not limits:
+            return
+
+        retry_after = await hit_rate_limits(limits, self.window)
+
+        if retry_after:
+            raise TooManyRequests(retry_after)
+
+
 # Shipment service dep
 def get_shipment_service(session: SessionDep):
     return ShipmentService(
@@ -80,12 +144,12 @@ def get_seller_service(session: SessionDep):
 
 
 # Delivery partner service dep
-def get_delivery_partner_service(session: SessionDep, tasks: BackgroundTasks):
-    return DeliveryPartnerService(session, tasks)
+def get_delivery_partner_service(session: SessionDep):
+    return DeliveryPartnerService(session)
 
 
-SellerDep = Annotated[Seller, Depends(get_current_seller)]
-DeliveryPartnerDep = Annotated[DeliveryPartner, Depends(get_current_partner)]
+SellerDep = Annotated[SellerPrincipal, Depends(get_current_seller)]
+DeliveryPartnerDep = Annotated[PartnerPrincipal, Depends(get_current_partner)]
 ShipmentServiceDep = Annotated[ShipmentService, Depends(get_shipment_service)]
 SellerServiceDep = Annotated[SellerService, Depends(get_seller_service)]
 
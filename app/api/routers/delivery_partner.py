@@ -5,6 +5,7 @@ from fastapi.security import OAuth2PasswordRequestForm
 from app.api.dependencies import (
     DeliveryPartnerDep,
     DeliveryPartnerServiceDep,
+    RateLimit,
     get_delivery_partner_access_token,
 )
 from app.api.schemas.delivery_partner import (
@@ -13,6 +14,7 @@ from app.api.schemas.delivery_partner import (
     DeliveryPartnerUpdate,
 )
 from app.api.tag import APITag
+from app.config import security_settings
 from app.core.exceptions import EntityNotFound
 from app.database.redis import add_jti_to_blacklist
 
@@ -20,7 +22,17 @@ router = APIRouter(prefix="/partner", tags=[APITag.PARTNER])
 
 
 ### Register a new delivery partner
-@router.post("/signup", response_model=DeliveryPartnerRead)
+@router.post(
+    "/signup",
+    dependencies=[
+        Depends(
+            RateLimit(
+                "partner_signup", per_ip=security_settings.SIGNUP_RATE_LIMIT_PER_IP
+            )
+        )
+    ],
+    response_model=DeliveryPartnerRead,
+)
 async def register_delivery_partner(
     partner: DeliveryPartnerCreate, service: DeliveryPartnerServiceDep
 ):
@@ -28,7 +40,18 @@ async def register_delivery_partner(
 
 
 ### Login a delivery partner
-@router.post("/token")
+@router.post(
+    "/token",
+    dependencies=[
+        Depends(
+            RateLimit(
+                "partner_token",
+                per_ip=security_settings.LOGIN_RATE_LIMIT_PER_IP,
+                per_email=security_settings.LOGIN_RATE_LIMIT_PER_EMAIL,
+            )
+        )
+    ],
+)
 async def login_delivery_partner(
     request_form: Annotated[OAuth2PasswordRequestForm, Depends()],
     service: DeliveryPartnerServiceDep,
@@ -49,7 +72,7 @@ async def update_delivery_partner(
     if not update:
         raise EntityNotFound
 
-    return await service.update(partner.sqlmodel_update(update))
+    return await service.update(partner.id, update)
 
 
 ### Logout a delivery partner
@@ -57,7 +80,7 @@ async def update_delivery_partner(
 async def logout_delivery_partner(
     token_data: Annotated[dict, Depends(get_delivery_partner_access_token)],
 ):
-    await add_jti_to_blacklist(token_data["jti"])
+    await add_jti_to_blacklist(token_data["jti"], token_data["exp"])
     return {"detail": "Successfully logged out!"}
 
 
@@ -1,30 +1,51 @@
 from typing import Annotated
-from fastapi import APIRouter, Depends, Form, Request
+from fastapi import APIRouter, Depends, Form
 from fastapi.security import OAuth2PasswordRequestForm
-from fastapi.templating import Jinja2Templates
 from pydantic import EmailStr
 
 from app.api.dependencies import (
+    RateLimit,
     SellerServiceDep,
     get_seller_access_token,
 )
 from app.api.schemas.seller import SellerCreate, SellerRead
 from app.api.tag import APITag
-from app.config import app_settings
+from app.config import app_settings, security_settings
+from app.core.templates import template_response
 from app.database.redis import add_jti_to_blacklist
-from app.utils import TEMPLATE_DIR
 
 router = APIRouter(prefix="/seller", tags=[APITag.SELLER])
 
 
 ### Register a new seller
-@router.post("/signup", response_model=SellerRead)
+@router.post(
+    "/signup",
+    dependencies=[
+        Depends(
+            RateLimit(
+                "seller_signup", per_ip=security_settings.SIGNUP_RATE_LIMIT_PER_IP
+            )
+        )
+    ],
+    response_model=SellerRead,
+)
 async def register_seller(seller: SellerCreate, service: SellerServiceDep):
     return await service.add(seller)
 
 
 ### Login a seller
-@router.post("/token")
+@router.post(
+    "/token",
+    dependencies=[
+        Depends(
+            RateLimit(
+                "seller_token",
+                per_ip=security_settings.LOGIN_RATE_LIMIT_PER_IP,
+                per_email=security_settings.LOGIN_RATE_LIMIT_PER_EMAIL,
+            )
+        )
+    ],
+)
 async def login_seller(
     request_form: Annotated[OAuth2PasswordRequestForm, Depends()],
     service: SellerServiceDep,
@@ -36,7 +57,7 @@ async def login_seller(
 ### Logout a seller
 @router.get("/logout")
 async def logout_seller(token_data: Annotated[dict, Depends(get_seller_access_token)]):
-    await add_jti_to_blacklist(token_data["jti"])
+    await add_jti_to_blacklist(token_data["jti"], token_data["exp"])
     return {"detail": "Successfully logged out!"}
 
 
@@ -48,7 +69,18 @@ async def verify_seller_email(token: str, service: SellerServiceDep):
 
 
 ### Email Password Reset Link
-@router.get("/forgot_password")
+@router.get(
+    "/forgot_password",
+    dependencies=[
+        Depends(
+            RateLimit(
+                "seller_forgot_password",
+                per_ip=security_settings.FORGOT_PASSWORD_RATE_LIMIT_PER_IP,
+                per_email=security_settings.FORGOT_PASSWORD_RATE_LIMIT_PER_EMAIL,
+            )
+        )
+    ],
+)
 async def forgot_password(email: EmailStr, service: SellerServiceDep):
     await service.send_password_reset_link(email, router.prefix)
     return {"detail": "Check email for password reset link"}
@@ -57,34 +89,23 @@ async def forgot_password(email: EmailStr, service: SellerServiceDep):
 ### Reset Seller Password
 @router.post("/reset_password")
 async def reset_password(
-    request: Request,
     token: str,
     password: Annotated[str, Form()],
     service: SellerServiceDep,
 ):
     is_success = await service.reset_password(token=token, password=password)
 
-    templates = Jinja2Templates(TEMPLATE_DIR)
-
-    return templates.TemplateResponse(
-        request=request,
-        name=(
-            "password/reset_success.html"
-            if is_success
-            else "password/reset_failed.html"
-        ),
+    return await template_response(
+        "password/reset_success.html" if is_success else "password/reset_failed.html"
     )
 
 
 ### Password Reset Form
 @router.get("/reset_password_form")
-async def get_reset_password_form(request: Request, token: str):
-    templates = Jinja2Templates(TEMPLATE_DIR)
-
-    return templates.TemplateResponse(
-        request=request,
-        name="password/reset.html",
-        context={
+async def get_reset_password_form(token: str):
+    return await template_response(
+        "password/reset.html",
+        {
             "reset_url": f"http://{app_settings.APP_DOMAIN}{router.prefix}/reset_password?token={token}",
         },
     )
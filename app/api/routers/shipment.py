@@ -1,60 +1,210 @@
-from typing import Annotated
+import asyncio
+import json
+from datetime import datetime, timezone
+from email.utils import format_datetime
+from typing import Annotated, Awaitable, Callable
 from uuid import UUID
-from fastapi import APIRouter, Form, HTTPException, Request, status
-from fastapi.templating import Jinja2Templates
+from fastapi import (
+    APIRouter,
+    Body,
+    Depends,
+    Form,
+    Header,
+    HTTPException,
+    Query,
+    Response,
+    status,
+)
+from fastapi.responses import StreamingResponse
 
 from app.api.dependencies import (
     DeliveryPartnerDep,
     SellerDep,
-    SessionDep,
     ShipmentServiceDep,
+    get_shipment_service,
 )
 from app.api.schemas.shipment import (
+    ShipmentBatchResult,
     ShipmentCreate,
+    ShipmentFilter,
+    ShipmentPage,
     ShipmentRead,
+    ShipmentScan,
+    ShipmentScanResult,
     ShipmentUpdate,
 )
 from app.api.tag import APITag
 from app.config import app_settings
 from app.core.exceptions import EntityNotFound
-from app.database.models import TagName
-from app.utils import TEMPLATE_DIR
+from app.core.security import SellerPrincipal
+from app.core.templates import render_template, template_response
+from app.database.models import Shipment, TagName
+from app.database.redis import tracking_hub
+from app.database.session import async_session
+from app.services.shipment import (
+    SHIPMENT_READ_OPTIONS,
+    SHIPMENT_TRACKING_OPTIONS,
+    ShipmentService,
+)
 
 router = APIRouter(prefix="/shipment", tags=[APITag.SHIPMENT])
 
-templates = Jinja2Templates(TEMPLATE_DIR)
-
 
 ### Read a shipment by id
 @router.get("/", response_model=ShipmentRead)
-async def get_shipment(id: UUID, _: SellerDep, service: ShipmentServiceDep):
-    shipment = await service.get(id)
+async def get_shipment(
+    id: UUID,
+    _: SellerDep,
+    service: ShipmentServiceDep,
+    if_none_match: Annotated[str | None, Header()] = None,
+):
+    return await _versioned_response(
+        id,
+        if_none_match,
+        service,
+        representation="read",
+        media_type="application/json",
+        options=SHIPMENT_READ_OPTIONS,
+        render=_render_read,
+    )
 
-    if shipment is None:
-        raise EntityNotFound
 
-    return shipment
+async def _render_read(shipment: Shipment) -> str:
+    return ShipmentRead.model_validate(shipment, from_attributes=True).model_dump_json()
+
+
+### List shipments of the seller, newest first
+@router.get("/list", response_model=ShipmentPage)
+async def list_shipments(
+    seller: SellerDep,
+    filters: Annotated[ShipmentFilter, Depends()],
+    service: ShipmentServiceDep,
+    limit: Annotated[int, Query(ge=1, le=100)] = 20,
+    cursor: str | None = None,
+):
+    return await service.get_page(seller, filters, limit, cursor)
 
 
 ### Tracking details of shipment
 @router.get("/track", include_in_schema=False)
-async def get_tracking(request: Request, id: UUID, service: ShipmentServiceDep):
-    shipment = await service.get(id)
+async def get_tracking(
+    id: UUID,
+    service: ShipmentServiceDep,
+    if_none_match: Annotated[str | None, Header()] = None,
+):
+    return await _versioned_response(
+        id,
+        if_none_match,
+        service,
+        representation="tracking",
+        media_type="text/html",
+        options=SHIPMENT_TRACKING_OPTIONS,
+        render=_render_tracking,
+    )
 
-    if shipment is None:
-        raise EntityNotFound
 
+async def _render_tracking(shipment: Shipment) -> str:
     context = shipment.model_dump()
     context["status"] = shipment.status
     context["partner"] = shipment.delivery_partner.name
-    context["timeline"] = shipment.timeline
-    context["timeline"].reverse()
+    # Newest first
+    context["timeline"] = shipment.timeline[::-1]
+
+    return await render_template("track.html", context)
+
+
+async def _versioned_response(
+    id: UUID,
+    if_none_match: str | None,
+    service: ShipmentService,
+    representation: str,
+    media_type: str,
+    options: tuple,
+    render: Callable[[Shipment], Awaitable[str]],
+) -> Response:
+    # A client holding the current version is answered from the version alone
+    version = await service.get_version(id)
+
+    if version is None:
+        raise EntityNotFound
+
+    if if_none_match and _etag_matches(if_none_match, version):
+        return Response(
+            status_code=status.HTTP_304_NOT_MODIFIED, headers=_version_headers(version)
+        )
+
+    cached = await service.get_cached_response(id, version, representation)
+    if cached is not None:
+        body, updated_at = cached
+        return Response(
+            body, media_type=media_type, headers=_version_headers(version, updated_at)
+        )
+
+    shipment = await service.get(id, *options)
 
-    return templates.TemplateResponse(
-        request=request, name="track.html", context=context
+    if shipment is None:
+        raise EntityNotFound
+
+    body = (await render(shipment)).encode()
+    # Under the loaded version, which may be newer than the one checked
+    await service.cache_response(shipment, representation, body)
+
+    return Response(
+        body,
+        media_type=media_type,
+        headers=_version_headers(shipment.version, shipment.updated_at),
     )
 
 
+def _etag_matches(if_none_match: str, version: int) -> bool:
+    # Weak comparison, as If-None-Match calls for
+    return any(
+        tag.strip().removeprefix("W/") in (f'"{version}"', "*")
+        for tag in if_none_match.split(",")
+    )
+
+
+def _version_headers(version: int, updated_at: datetime | None = None) -> dict:
+    # Clients revalidate on every read instead of guessing freshness
+    headers = {"ETag": f'"{version}"', "Cache-Control": "no-cache"}
+
+    if updated_at is not None:
+        # Stored as naive local time
+        headers["Last-Modified"] = format_datetime(
+            updated_at.astimezone(timezone.utc), usegmt=True
+        )
+
+    return headers
+
+
+### Live tracking events of shipment
+@router.get("/track/stream", include_in_schema=False)
+async def stream_tracking(id: UUID, service: ShipmentServiceDep):
+    if await service.get(id) is None:
+        raise EntityNotFound
+
+    return StreamingResponse(
+        _stream_tracking(id),
+        media_type="text/event-stream",
+        # Keep proxies from buffering the stream
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+async def _stream_tracking(shipment_id: UUID):
+    async with tracking_hub.subscribe(shipment_id) as events:
+        while True:
+            try:
+                event = await asyncio.wait_for(
+                    events.get(), timeout=app_settings.TRACKING_KEEPALIVE_INTERVAL
+                )
+            except asyncio.TimeoutError:
+                # Lets the server notice disconnected clients
+                yield ": keepalive\n\n"
+            else:
+                yield f"event: timeline\ndata: {json.dumps(event)}\n\n"
+
+
 ### Create a new shipment with content and weight
 @router.post(
     "/",
@@ -95,6 +245,16 @@ async def submit_shipment(
     return await service.add(shipment, seller)
 
 
+### Create many shipments at once
+@router.post("/batch", response_model=list[ShipmentBatchResult])
+async def submit_shipment_batch(
+    seller: SellerDep,
+    shipments: Annotated[list[ShipmentCreate], Body(min_length=1, max_length=1000)],
+    service: ShipmentServiceDep,
+):
+    return await service.add_batch(shipments, seller)
+
+
 ### Update fields of a shipment
 @router.patch("/", response_model=ShipmentRead)
 async def update_shipment(
@@ -111,6 +271,16 @@ async def update_shipment(
     return await service.update(id, shipment_update, partner)
 
 
+### Record scans of many shipments at once
+@router.patch("/batch", response_model=list[ShipmentScanResult])
+async def update_shipment_batch(
+    partner: DeliveryPartnerDep,
+    scans: Annotated[list[ShipmentScan], Body(min_length=1, max_length=5000)],
+    service: ShipmentServiceDep,
+):
+    return await service.update_batch(scans, partner)
+
+
 ### Cancel a shipment by id
 @router.get("/cancel", response_model=ShipmentRead)
 async def cancel_shipment(id: UUID, seller: SellerDep, service: ShipmentServiceDep):
@@ -124,11 +294,10 @@ async def cancel_shipment(id: UUID, seller: SellerDep, service: ShipmentServiceD
 
 ### Sumbit a reivew for a shipment
 @router.get("/review")
-async def submit_review_page(request: Request, token: str):
-    return templates.TemplateResponse(
-        request=request,
-        name="review.html",
-        context={
+async def submit_review_page(token: str):
+    return await template_response(
+        "review.html",
+        {
             "review_url": f"http://{app_settings.APP_DOMAIN}/shipment/review?token={token}",
         },
     )
@@ -161,7 +330,32 @@ async def remove_tag_from_shipment(
 
 
 ### Get all shipments with a tag
-@router.get("/tagged", response_model=list[ShipmentRead])
-async def get_shipments_with_tag(tag_name: TagName, session: SessionDep):
-    tag = await tag_name.tag(session)
-    return tag.shipments
+@router.get("/tagged", response_model=ShipmentPage)
+async def get_shipments_with_tag(
+    seller: SellerDep,
+    tag_name: TagName,
+    service: ShipmentServiceDep,
+    limit: Annotated[int, Query(ge=1, le=100)] = 20,
+    cursor: str | None = None,
+    stream: Annotated[
+        bool, Query(description="stream all shipments as newline delimited json")
+    ] = False,
+):
+    if stream:
+        return StreamingResponse(
+            _stream_shipments_with_tag(seller, tag_name),
+            media_type="application/x-ndjson",
+        )
+
+    return await service.get_tagged_page(seller, tag_name, limit, cursor)
+
+
+async def _stream_shipments_with_tag(seller: SellerPrincipal, tag_name: TagName):
+    # The request session closes before the response body is sent
+    async with async_session() as session:
+        async for shipment in get_shipment_service(session).iter_tagged(
+            seller, tag_name
+        ):
+            yield ShipmentRead.model_validate(
+                shipment, from_attributes=True
+            ).model_dump_json() + "\n"
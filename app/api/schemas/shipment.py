@@ -1,7 +1,7 @@
 from datetime import datetime
 from random import randint
 from uuid import UUID
-from pydantic import BaseModel, EmailStr, Field
+from pydantic import BaseModel, EmailStr, Field, field_validator
 
 from app.database.models import Seller, ShipmentEvent, ShipmentStatus, Tag, TagName
 
@@ -35,6 +35,35 @@ class ShipmentCreate(BaseShipment):
     client_contact_phone: int | None = Field(default=None)
 
 
+class ShipmentPage(BaseModel):
+    items: list[ShipmentRead]
+    next_cursor: str | None = Field(
+        default=None, description="pass as cursor to get the next page"
+    )
+
+
+class ShipmentFilter(BaseModel):
+    status: ShipmentStatus | None = Field(default=None)
+    tag: TagName | None = Field(default=None)
+    destination: int | None = Field(default=None)
+    created_after: datetime | None = Field(default=None)
+    created_before: datetime | None = Field(default=None)
+
+    @field_validator("created_after", "created_before")
+    @classmethod
+    def to_local_time(cls, value: datetime | None) -> datetime | None:
+        # Shipment timestamps are stored as naive local time
+        if value and value.tzinfo:
+            return value.astimezone().replace(tzinfo=None)
+        return value
+
+
+class ShipmentBatchResult(BaseModel):
+    index: int
+    shipment: ShipmentRead | None = Field(default=None)
+    error: str | None = Field(default=None)
+
+
 class ShipmentUpdate(BaseModel):
     location: int | None = Field(default=None)
     status: ShipmentStatus | None = Field(default=None)
@@ -42,6 +71,20 @@ class ShipmentUpdate(BaseModel):
     estimated_delivery: datetime | None = Field(default=None)
 
 
+class ShipmentScan(BaseModel):
+    id: UUID
+    location: int | None = Field(default=None)
+    status: ShipmentStatus | None = Field(default=None)
+    description: str | None = Field(default=None)
+
+
+class ShipmentScanResult(BaseModel):
+    index: int
+    id: UUID
+    status: ShipmentStatus | None = Field(default=None)
+    error: str | None = Field(default=None)
+
+
 class ShipmentReview(BaseModel):
     rating: int = Field(ge=1, le=5)
     comment: str | None = Field(default=None)
@@ -0,0 +1,86 @@
+import asyncio
+from datetime import date, timedelta
+from pathlib import Path
+
+import typer
+
+from app.config import app_settings
+from app.database.partitions import shipment_event_partitions
+from app.database.session import async_session, engine
+from app.services.deliver_partner import DeliveryPartnerService
+from app.services.outbox import OutboxService
+
+cli = typer.Typer(help="FastShip maintenance commands")
+
+
+@cli.callback()
+def main():
+    pass
+
+
+### Recount active shipments of every delivery partner
+@cli.command()
+def repair_capacity():
+    async def repair():
+        async with async_session() as session:
+            await DeliveryPartnerService(session).repair_active_shipment_counts()
+
+    asyncio.run(repair())
+    typer.echo("Delivery partner capacity repaired")
+
+
+### Relay outbox tasks to the worker, run as many as throughput needs
+@cli.command()
+def relay_outbox(
+    batch_size: int = app_settings.OUTBOX_BATCH_SIZE,
+    poll_interval: float = app_settings.OUTBOX_POLL_INTERVAL,
+    once: bool = typer.Option(False, help="Exit once the outbox is drained"),
+):
+    async def relay():
+        async with async_session() as session:
+            service = OutboxService(session)
+
+            while True:
+                # Keep draining while batches come back full
+                if await service.relay(batch_size) < batch_size:
+                    if once:
+                        break
+                    await asyncio.sleep(poll_interval)
+
+    asyncio.run(relay())
+
+
+### Create shipment event partitions for the coming months, run daily
+@cli.command()
+def create_partitions():
+    async def create():
+        async with engine.begin() as connection:
+            return await shipment_event_partitions.create(connection)
+
+    for name in asyncio.run(create()):
+        typer.echo(f"Created {name}")
+
+
+### Detach shipment event partitions past retention, optionally export and drop
+@cli.command()
+def archive_partitions(
+    retention_days: int = app_settings.SHIPMENT_EVENT_RETENTION_DAYS,
+    export_dir: Path | None = typer.Option(
+        None,
+        file_okay=False,
+        exists=True,
+        writable=True,
+        help="Write partitions here as gzipped csv, then drop them",
+    ),
+):
+    async def archive():
+        return await shipment_event_partitions.archive(
+            engine, date.today() - timedelta(days=retention_days), export_dir
+        )
+
+    for name in asyncio.run(archive()):
+        typer.echo(f"Archived {name}")
+
+
+if __name__ == "__main__":
+    cli()
@@ -1,3 +1,5 @@
+from typing import Literal
+
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 _base_config = SettingsConfigDict(
@@ -11,6 +13,33 @@ class AppSettings(BaseSettings):
     APP_NAME: str = "FastShip"
     APP_DOMAIN: str = "localhost:8000"
 
+    # Seconds before a worker reloads its zip code coverage index
+    ZIPCODE_INDEX_MAX_AGE: int = 60
+    # How a delivery partner is picked among those with free capacity
+    PARTNER_ASSIGNMENT_POLICY: Literal["first_fit", "least_loaded", "round_robin"] = (
+        "first_fit"
+    )
+    # Outbox rows relayed to the worker per transaction, and seconds between
+    # polls once the outbox is drained
+    OUTBOX_BATCH_SIZE: int = 100
+    OUTBOX_POLL_INTERVAL: float = 1
+    # Monthly shipment event partitions created ahead of the current month,
+    # and days after its month ends that a partition is archived
+    PARTITION_MONTHS_AHEAD: int = 3
+    SHIPMENT_EVENT_RETENTION_DAYS: int = 90
+    # Live tracking events buffered per client before it misses some,
+    # and seconds between keepalives on an idle stream
+    TRACKING_QUEUE_SIZE: int = 100
+    TRACKING_KEEPALIVE_INTERVAL: int = 15
+    # Seconds a shipment's version, and its reads rendered at a version,
+    # stay cached in redis
+    SHIPMENT_VERSION_CACHE_TTL: int = 300
+    SHIPMENT_RESPONSE_CACHE_TTL: int = 3600
+    # Recheck template files for changes, for development only
+    TEMPLATE_AUTO_RELOAD: bool = False
+    # Compiled template bytecode, a per user temp directory when unset
+    TEMPLATE_BYTECODE_CACHE_DIR: str | None = None
+
 
 class DatabaseSettings(BaseSettings):
     POSTGRES_SERVER: str
@@ -19,8 +48,38 @@ class DatabaseSettings(BaseSettings):
     POSTGRES_PASSWORD: str
     POSTGRES_DB: str
 
+    # Log every sql statement
+    POSTGRES_ECHO: bool = False
+    # Connections kept open per worker, and extra ones allowed under load
+    POSTGRES_POOL_SIZE: int = 10
+    POSTGRES_MAX_OVERFLOW: int = 20
+    # Seconds to wait for a free connection before failing
+    POSTGRES_POOL_TIMEOUT: int = 30
+    # Seconds after which a connection is replaced
+    POSTGRES_POOL_RECYCLE: int = 1800
+    POSTGRES_POOL_PRE_PING: bool = True
+    # Prepared statements cached per asyncpg connection, 0 to disable
+    POSTGRES_STATEMENT_CACHE_SIZE: int = 100
+    # Milliseconds before postgres cancels a statement
+    POSTGRES_STATEMENT_TIMEOUT: int = 30000
+
     REDIS_HOST: str
     REDIS_PORT: str
+    # Connections per redis database and worker, and seconds to wait for one
+    REDIS_MAX_CONNECTIONS: int = 50
+    REDIS_POOL_TIMEOUT: int = 5
+    REDIS_SOCKET_TIMEOUT: float = 5
+    REDIS_SOCKET_CONNECT_TIMEOUT: float = 5
+    # Seconds a connection may sit idle before it is pinged on checkout
+    REDIS_HEALTH_CHECK_INTERVAL: int = 30
+    # Redis database of each store
+    REDIS_BLACKLIST_DB: int = 0
+    REDIS_PRINCIPAL_DB: int = 1
+    REDIS_RATE_LIMIT_DB: int = 2
+    REDIS_TRACKING_DB: int = 3
+    REDIS_RESPONSE_CACHE_DB: int = 4
+    REDIS_COVERAGE_DB: int = 5
+    REDIS_BROKER_DB: int = 9
 
     model_config = _base_config
 
@@ -38,6 +97,26 @@ class SecuritySettings(BaseSettings):
     JWT_ALGORITHM: str
     SECURITY_SALT: str
 
+    # Authenticated user profiles cached per worker and in redis, in seconds
+    PRINCIPAL_CACHE_TTL: int = 30
+    PRINCIPAL_CACHE_REDIS_TTL: int = 300
+    PRINCIPAL_CACHE_SIZE: int = 10000
+    # Tokens known not to be blacklisted, cached per worker
+    BLACKLIST_CACHE_TTL: int = 60
+    BLACKLIST_CACHE_SIZE: int = 100000
+    # Verified access token claims cached per worker, until the token expires
+    ACCESS_TOKEN_CACHE_SIZE: int = 10000
+    # Threads hashing passwords per worker, and calls allowed to wait for one
+    PASSWORD_HASH_WORKERS: int = 4
+    PASSWORD_HASH_QUEUE_LIMIT: int = 64
+    # Requests allowed per client ip and per email within the sliding window
+    RATE_LIMIT_WINDOW: int = 60
+    LOGIN_RATE_LIMIT_PER_IP: int = 30
+    LOGIN_RATE_LIMIT_PER_EMAIL: int = 5
+    SIGNUP_RATE_LIMIT_PER_IP: int = 5
+    FORGOT_PASSWORD_RATE_LIMIT_PER_IP: int = 5
+    FORGOT_PASSWORD_RATE_LIMIT_PER_EMAIL: int = 2
+
     model_config = _base_config
 
 
@@ -53,6 +132,12 @@ class NotificationSettings(BaseSettings):
     MAIL_SSL_TLS: bool = False
     USE_CREDENTIALS: bool = True
     VALIDATE_CERTS: bool = True
+    # Seconds to wait on the mail server
+    MAIL_TIMEOUT: int = 60
+    # Open smtp connections per worker process, and messages sent over
+    # one before it is replaced
+    MAIL_POOL_SIZE: int = 4
+    MAIL_MAX_MESSAGES_PER_CONNECTION: int = 100
 
     model_config = _base_config
 
@@ -30,6 +30,12 @@ class NothingToUpdate(FastShipError):
     """No data provided to update"""
 
 
+class ShipmentClosed(FastShipError):
+    """Shipment is already delivered or cancelled"""
+
+    status = status.HTTP_409_CONFLICT
+
+
 class BadCredentials(FastShipError):
     """User email or password is incorrect"""
 
@@ -42,6 +48,26 @@ class InvalidToken(FastShipError):
     status = status.HTTP_401_UNAUTHORIZED
 
 
+class ServerBusy(FastShipError):
+    """Server is busy, try again later"""
+
+    status = status.HTTP_503_SERVICE_UNAVAILABLE
+
+
+class TooManyRequests(FastShipError):
+    """Too many requests, try again later"""
+
+    status = status.HTTP_429_TOO_MANY_REQUESTS
+
+    def __init__(self, retry_after: int):
+        super().__init__()
+        self.headers = {"Retry-After": str(retry_after)}
+
+
+class InvalidCursor(FastShipError):
+    """Pagination cursor is invalid"""
+
+
 class DeliveryPartnerNotAvailable(FastShipError):
     """Delivery partner/s do not service the destination"""
 
@@ -60,7 +86,11 @@ def _get_handler(status: int, detail: str | None):
 
         print(panel.Panel(f"Handled: {exception.__class__.__name__}"))
 
-        raise HTTPException(status_code=status, detail=detail)
+        raise HTTPException(
+            status_code=status,
+            detail=detail,
+            headers=getattr(exception, "headers", None),
+        )
 
     return handler
 
@@ -1,5 +1,23 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from uuid import UUID
+
 from fastapi.security import OAuth2PasswordBearer
-from pydantic import BaseModel
+from passlib.context import CryptContext
+from prometheus_client import Counter, Gauge
+from pydantic import BaseModel, EmailStr
+
+from app.config import security_settings
+from app.core.exceptions import ServerBusy
+
+PASSWORD_HASH_QUEUE_DEPTH = Gauge(
+    "password_hash_queue_depth",
+    "Password hash and verify calls queued or running",
+)
+PASSWORD_HASH_REJECTED = Counter(
+    "password_hash_rejected_total",
+    "Password hash and verify calls rejected because the queue was full",
+)
 
 
 oauth2_scheme_seller = OAuth2PasswordBearer(
@@ -13,3 +31,58 @@ oauth2_scheme_partner = OAuth2PasswordBearer(
 class TokenData(BaseModel):
     access_token: str
     token_type: str
+
+
+class SellerPrincipal(BaseModel):
+    """Profile snapshot of the authenticated seller"""
+
+    id: UUID
+    name: str
+    email: EmailStr
+    zip_code: int | None = None
+
+
+class PartnerPrincipal(BaseModel):
+    """Profile snapshot of the authenticated delivery partner"""
+
+    id: UUID
+    name: str
+    email: EmailStr
+
+
+class PasswordHasher:
+    """Runs bcrypt in a bounded thread pool instead of on the event loop.
+
+    bcrypt releases the GIL, so hashes run in parallel across the threads.
+    Calls beyond the queue limit are rejected instead of piling up.
+    """
+
+    def __init__(self, workers: int, queue_limit: int):
+        self._context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+        self._executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="password_hash"
+        )
+        self._slots = asyncio.Semaphore(workers + queue_limit)
+
+    async def _run(self, function, *args):
+        if self._slots.locked():
+            PASSWORD_HASH_REJECTED.inc()
+            raise ServerBusy
+
+        async with self._slots:
+            with PASSWORD_HASH_QUEUE_DEPTH.track_inprogress():
+                return await asyncio.get_running_loop().run_in_executor(
+                    self._executor, function, *args
+                )
+
+    async def hash(self, password: str) -> str:
+        return await self._run(self._context.hash, password)
+
+    async def verify(self, password: str, password_hash: str) -> bool:
+        return await self._run(self._context.verify, password, password_hash)
+
+
+password_hasher = PasswordHasher(
+    workers=security_settings.PASSWORD_HASH_WORKERS,
+    queue_limit=security_settings.PASSWORD_HASH_QUEUE_LIMIT,
+)
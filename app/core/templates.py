@@ -0,0 +1,28 @@
+from fastapi.responses import HTMLResponse
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader
+
+from app.config import app_settings
+from app.utils import TEMPLATE_DIR
+
+# Shared by the api and the worker. Compiled templates stay cached in memory
+# and their bytecode on disk, so new processes skip parsing too.
+templates = Environment(
+    loader=FileSystemLoader(TEMPLATE_DIR),
+    bytecode_cache=FileSystemBytecodeCache(app_settings.TEMPLATE_BYTECODE_CACHE_DIR),
+    auto_reload=app_settings.TEMPLATE_AUTO_RELOAD,
+    autoescape=True,
+    enable_async=True,
+)
+
+
+def preload_templates():
+    for name in templates.list_templates():
+        templates.get_template(name)
+
+
+async def render_template(name: str, context: dict | None = None) -> str:
+    return await templates.get_template(name).render_async(**(context or {}))
+
+
+async def template_response(name: str, context: dict | None = None) -> HTMLResponse:
+    return HTMLResponse(await render_template(name, context))
@@ -0,0 +1,114 @@
+import asyncio
+import json
+from collections import defaultdict
+from time import monotonic
+from uuid import UUID
+
+from redis.exceptions import RedisError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlmodel import select
+
+from app.config import app_settings, db_settings
+from app.database.models import DeliveryPartner
+from app.database.redis import redis_clients
+
+COVERAGE_CHANNEL = "partner_coverage"
+
+
+class ZipCodeIndex:
+    """In-process map of zip codes to the delivery partners servicing them.
+
+    Coverage changes are published, so every worker applies them at once
+    rather than on its next reload.
+    """
+
+    def __init__(self, max_age: int):
+        self.max_age = max_age
+        self._partners: dict[int, set[UUID]] = {}
+        self._zip_codes: dict[UUID, set[int]] = {}
+        self._loaded_at: float | None = None
+        self._lock = asyncio.Lock()
+
+    @property
+    def is_stale(self) -> bool:
+        return self._loaded_at is None or monotonic() - self._loaded_at > self.max_age
+
+    async def load(self, session: AsyncSession):
+        async with self._lock:
+            result = await session.execute(
+                select(DeliveryPartner.id, DeliveryPartner.serviceable_zip_codes)
+            )
+
+            partners = defaultdict(set)
+            zip_codes = {}
+            for id, serviceable_zip_codes in result:
+                zip_codes[id] = set(serviceable_zip_codes or [])
+                for zip_code in zip_codes[id]:
+                    partners[zip_code].add(id)
+
+            self._partners = dict(partners)
+            self._zip_codes = zip_codes
+            self._loaded_at = monotonic()
+
+    async def ensure_loaded(self, session: AsyncSession):
+        if self.is_stale:
+            await self.load(session)
+
+    def invalidate(self):
+        self._loaded_at = None
+
+    def set_partner(self, id: UUID, serviceable_zip_codes: list[int] | None):
+        # Partners added before the first load are picked up by it
+        if self._loaded_at is None:
+            return
+
+        for zip_code in self._zip_codes.pop(id, set()):
+            self._partners[zip_code].discard(id)
+
+        self._zip_codes[id] = set(serviceable_zip_codes or [])
+        for zip_code in self._zip_codes[id]:
+            self._partners.setdefault(zip_code, set()).add(id)
+
+    def partners(self, zip_code: int) -> set[UUID]:
+        return self._partners.get(zip_code, set())
+
+    async def publish(self, id: UUID, serviceable_zip_codes: list[int] | None):
+        self.set_partner(id, serviceable_zip_codes)
+
+        await redis_clients.get(db_settings.REDIS_COVERAGE_DB).publish(
+            COVERAGE_CHANNEL,
+            json.dumps({"id": str(id), "zip_codes": serviceable_zip_codes}),
+        )
+
+    async def listen(self):
+        subscribed_before = False
+
+        while True:
+            try:
+                client = redis_clients.get(db_settings.REDIS_COVERAGE_DB)
+
+                async with client.pubsub() as pubsub:
+                    await pubsub.subscribe(COVERAGE_CHANNEL)
+
+                    # Changes may have been missed while resubscribing
+                    if subscribed_before:
+                        self.invalidate()
+                    subscribed_before = True
+
+                    while True:
+                        message = await pubsub.get_message(
+                            ignore_subscribe_messages=True,
+                            timeout=db_settings.REDIS_HEALTH_CHECK_INTERVAL,
+                        )
+                        if message is not None:
+                            change = json.loads(message["data"])
+                            self.set_partner(UUID(change["id"]), change["zip_codes"])
+            except RedisError:
+                await asyncio.sleep(1)
+
+
+zipcode_index = ZipCodeIndex(max_age=app_settings.ZIPCODE_INDEX_MAX_AGE)
+
+
+async def listen_for_coverage_changes():
+    await zipcode_index.listen()
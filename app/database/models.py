@@ -2,10 +2,9 @@ from datetime import datetime
 from enum import Enum
 from uuid import UUID, uuid4
 from pydantic import EmailStr
-from sqlmodel import Column, Field, Relationship, SQLModel, select
+from sqlmodel import Column, Field, Relationship, SQLModel
 from sqlalchemy.dialects import postgresql
-from sqlalchemy import ARRAY, INTEGER
-from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import INTEGER, Index
 
 
 class ShipmentStatus(str, Enum):
@@ -18,6 +17,10 @@ class ShipmentStatus(str, Enum):
     cancelled = "cancelled"
 
 
+# Shipments in these statuses no longer count against partner capacity
+INACTIVE_SHIPMENT_STATUSES = (ShipmentStatus.delivered, ShipmentStatus.cancelled)
+
+
 class TagName(str, Enum):
     EXPRESS = "express"
     STANDARD = "standard"
@@ -30,12 +33,12 @@ class TagName(str, Enum):
     RETURN = "return"
     DOCUMENTS = "documents"
 
-    async def tag(self, session: AsyncSession) -> "Tag":
-        return await session.scalar(select(Tag).where(Tag.name == self.value))
-
 
 class ShipmentTag(SQLModel, table=True):
     __tablename__ = "shipment_tag"
+    __table_args__ = (
+        Index("ix_shipment_tag_tag_id_shipment_id", "tag_id", "shipment_id"),
+    )
 
     shipment_id: UUID = Field(foreign_key="shipment.id", primary_key=True)
     tag_id: UUID = Field(foreign_key="tag.id", primary_key=True)
@@ -51,12 +54,23 @@ class Tag(SQLModel, table=True):
     shipments: list["Shipment"] = Relationship(
         back_populates="tags",
         link_model=ShipmentTag,
-        sa_relationship_kwargs={"lazy": "immediate"},
+        sa_relationship_kwargs={"lazy": "raise"},
     )
 
 
 class Shipment(SQLModel, table=True):
     __tablename__ = "shipment"
+    __table_args__ = (
+        # Keyset pagination of a seller's shipments, newest first
+        Index("ix_shipment_seller_id_created_at", "seller_id", "created_at", "id"),
+        Index(
+            "ix_shipment_seller_id_current_status_created_at",
+            "seller_id",
+            "current_status",
+            "created_at",
+            "id",
+        ),
+    )
 
     id: UUID = Field(sa_column=Column(postgresql.UUID, default=uuid4, primary_key=True))
 
@@ -75,45 +89,72 @@ class Shipment(SQLModel, table=True):
     destination: int
 
     timeline: list["ShipmentEvent"] = Relationship(
-        back_populates="shipment", sa_relationship_kwargs={"lazy": "selectin"}
+        back_populates="shipment",
+        sa_relationship_kwargs={
+            "lazy": "raise",
+            "order_by": "ShipmentEvent.created_at",
+        },
     )
 
     estimated_delivery: datetime | None
 
+    # Status and location of the latest timeline event
+    current_status: ShipmentStatus | None = Field(default=None, index=True)
+    current_location: int | None = Field(default=None)
+
+    # Bumped on every change to the shipment, its timeline or its tags,
+    # identifies cached reads of it
+    version: int = Field(default=1, sa_column_kwargs={"server_default": "1"})
+    updated_at: datetime = Field(
+        sa_column=Column(
+            postgresql.TIMESTAMP,
+            default=datetime.now,
+            nullable=False,
+        )
+    )
+
     seller_id: UUID = Field(foreign_key="seller.id")
     seller: "Seller" = Relationship(
-        back_populates="shipments", sa_relationship_kwargs={"lazy": "selectin"}
+        back_populates="shipments", sa_relationship_kwargs={"lazy": "raise"}
     )
 
     delivery_partner_id: UUID = Field(foreign_key="delivery_partner.id")
     delivery_partner: "DeliveryPartner" = Relationship(
-        back_populates="shipments", sa_relationship_kwargs={"lazy": "selectin"}
+        back_populates="shipments", sa_relationship_kwargs={"lazy": "raise"}
     )
 
     review: "Review" = Relationship(
-        back_populates="shipment", sa_relationship_kwargs={"lazy": "selectin"}
+        back_populates="shipment", sa_relationship_kwargs={"lazy": "raise"}
     )
 
     tags: list[Tag] = Relationship(
         back_populates="shipments",
         link_model=ShipmentTag,
-        sa_relationship_kwargs={"lazy": "immediate"},
+        sa_relationship_kwargs={"lazy": "raise"},
     )
 
     @property
     def status(self):
-        return self.timeline[-1].status if len(self.timeline) > 0 else None
+        return self.current_status
 
 
 class ShipmentEvent(SQLModel, table=True):
     __tablename__ = "shipment_event"
+    __table_args__ = (
+        # Timeline and latest event of a shipment
+        Index("ix_shipment_event_shipment_id_created_at", "shipment_id", "created_at"),
+        # Monthly partitions, see app.database.partitions
+        {"postgresql_partition_by": "RANGE (created_at)"},
+    )
 
     id: UUID = Field(sa_column=Column(postgresql.UUID, default=uuid4, primary_key=True))
 
+    # Part of the primary key, as the partition key must be
     created_at: datetime = Field(
         sa_column=Column(
             postgresql.TIMESTAMP,
             default=datetime.now,
+            primary_key=True,
         )
     )
 
@@ -123,7 +164,7 @@ class ShipmentEvent(SQLModel, table=True):
 
     shipment_id: UUID = Field(foreign_key="shipment.id")
     shipment: Shipment = Relationship(
-        back_populates="timeline", sa_relationship_kwargs={"lazy": "selectin"}
+        back_populates="timeline", sa_relationship_kwargs={"lazy": "raise"}
     )
 
 
@@ -151,12 +192,19 @@ class Seller(User, table=True):
     zip_code: int | None = Field(default=None)
 
     shipments: list[Shipment] = Relationship(
-        back_populates="seller", sa_relationship_kwargs={"lazy": "selectin"}
+        back_populates="seller", sa_relationship_kwargs={"lazy": "raise"}
     )
 
 
 class DeliveryPartner(User, table=True):
     __tablename__ = "delivery_partner"
+    __table_args__ = (
+        Index(
+            "ix_delivery_partner_serviceable_zip_codes",
+            "serviceable_zip_codes",
+            postgresql_using="gin",
+        ),
+    )
 
     id: UUID = Field(sa_column=Column(postgresql.UUID, default=uuid4, primary_key=True))
 
@@ -167,25 +215,26 @@ class DeliveryPartner(User, table=True):
         )
     )
 
-    serviceable_zip_codes: list[int] = Field(sa_column=Column(ARRAY(INTEGER)))
+    serviceable_zip_codes: list[int] = Field(
+        sa_column=Column(postgresql.ARRAY(INTEGER))
+    )
     max_handling_capacity: int
 
-    shipments: list[Shipment] = Relationship(
-        back_populates="delivery_partner", sa_relationship_kwargs={"lazy": "selectin"}
+    # Assigned shipments not yet delivered or cancelled
+    active_shipment_count: int = Field(
+        default=0, sa_column_kwargs={"server_default": "0"}
+    )
+    last_assigned_at: datetime | None = Field(
+        default=None, sa_column=Column(postgresql.TIMESTAMP, nullable=True)
     )
 
-    @property
-    def active_shipments(self):
-        return [
-            shipment
-            for shipment in self.shipments
-            if shipment.status
-            not in [ShipmentStatus.delivered, ShipmentStatus.cancelled]
-        ]
+    shipments: list[Shipment] = Relationship(
+        back_populates="delivery_partner", sa_relationship_kwargs={"lazy": "raise"}
+    )
 
     @property
     def current_handling_capacity(self):
-        return self.max_handling_capacity - len(self.active_shipments)
+        return self.max_handling_capacity - self.active_shipment_count
 
 
 class Review(SQLModel, table=True):
@@ -205,5 +254,24 @@ class Review(SQLModel, table=True):
 
     shipment_id: UUID = Field(foreign_key="shipment.id")
     shipment: Shipment = Relationship(
-        back_populates="review", sa_relationship_kwargs={"lazy": "selectin"}
+        back_populates="review", sa_relationship_kwargs={"lazy": "raise"}
+    )
+
+
+# Worker tasks written with the change that triggers them,
+# sent by the outbox relay once that transaction commits
+class Outbox(SQLModel, table=True):
+    __tablename__ = "outbox"
+
+    id: UUID = Field(sa_column=Column(postgresql.UUID, default=uuid4, primary_key=True))
+
+    created_at: datetime = Field(
+        sa_column=Column(
+            postgresql.TIMESTAMP,
+            default=datetime.now,
+            index=True,
+        )
     )
+
+    task: str
+    payload: dict = Field(sa_column=Column(postgresql.JSONB, nullable=False))
@@ -0,0 +1,206 @@
+import gzip
+import re
+from datetime import date
+from pathlib import Path
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+
+from app.config import app_settings
+
+
+def _add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+class MonthlyPartitions:
+    """Monthly range partitions of a table partitioned by created_at.
+
+    Partitions are named {table}_yYYYYmMM. Rows outside all of them land in
+    {table}_default, so future months are created ahead of time. A month
+    created late takes its rows over from the default partition.
+    """
+
+    def __init__(self, table: str, months_ahead: int):
+        self.table = table
+        self.months_ahead = months_ahead
+        self._name_pattern = re.compile(rf"{table}_y(\d{{4}})m(\d{{2}})")
+
+    def _name(self, month: date) -> str:
+        return f"{self.table}_y{month.year}m{month.month:02d}"
+
+    def is_partition(self, name: str) -> bool:
+        """Whether a table of this name is, or was detached from, a partition"""
+        return name == f"{self.table}_default" or bool(
+            self._name_pattern.fullmatch(name)
+        )
+
+    async def create(self, connection: AsyncConnection) -> list[str]:
+        """Create the partitions of this month and the months ahead, if missing.
+
+        Rows the default partition holds for a new month are moved into it.
+        Run it in a transaction, workers and the command may run it at once.
+        """
+        await connection.execute(
+            text("SELECT pg_advisory_xact_lock(hashtext(:table))"),
+            {"table": self.table},
+        )
+        await connection.execute(
+            text(
+                f"CREATE TABLE IF NOT EXISTS {self.table}_default "
+                f"PARTITION OF {self.table} DEFAULT"
+            )
+        )
+
+        existing = set(await self.months(connection))
+        this_month = date.today().replace(day=1)
+        created = []
+
+        for offset in range(self.months_ahead + 1):
+            month = _add_months(this_month, offset)
+            if month in existing:
+                continue
+
+            await self._create_month(connection, month)
+            created.append(self._name(month))
+
+        return created
+
+    async def _create_month(self, connection: AsyncConnection, month: date):
+        name = self._name(month)
+        bounds = f"FROM ('{month}') TO ('{_add_months(month, 1)}')"
+        in_month = f"created_at >= '{month}' AND created_at < '{_add_months(month, 1)}'"
+
+        if not await connection.scalar(
+            text(f"SELECT EXISTS (SELECT 1 FROM {self.table}_default WHERE {in_month})")
+        ):
+            await connection.execute(
+                text(
+                    f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF {self.table} "
+                    f"FOR VALUES {bounds}"
+                )
+            )
+            return
+
+        # Postgres refuses a partition for rows the default partition holds,
+        # build the table aside, move them over, then attach it
+        await connection.execute(
+            text(
+                f"CREATE TABLE {name} "
+                f"(LIKE {self.table} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"
+            )
+        )
+        await connection.execute(
+            text(
+                f"WITH moved AS (DELETE FROM {self.table}_default "
+                f"WHERE {in_month} RETURNING *) "
+                f"INSERT INTO {name} SELECT * FROM moved"
+            )
+        )
+        await connection.execute(
+            text(
+                f"ALTER TABLE {self.table} ATTACH PARTITION {name} FOR VALUES {bounds}"
+            )
+        )
+
+    async def months(self, connection: AsyncConnection) -> list[date]:
+        """First days of the months with an attached partition, oldest first"""
+        names = await connection.scalars(
+            text(
+                "SELECT child.relname FROM pg_inherits "
+                "JOIN pg_class AS parent ON parent.oid = pg_inherits.inhparent "
+                "JOIN pg_class AS child ON child.oid = pg_inherits.inhrelid "
+                "WHERE parent.relname = :table"
+            ),
+            {"table": self.table},
+        )
+
+        return sorted(
+            date(int(match[1]), int(match[2]), 1)
+            for name in names
+            if (match := self._name_pattern.fullmatch(name))
+        )
+
+    async def _detached(self, connection: AsyncConnection) -> list[date]:
+        """Months of partitions detached but not yet exported and dropped"""
+        names = await connection.scalars(
+            text(
+                "SELECT relname FROM pg_class "
+                "WHERE relkind = 'r' AND NOT relispartition AND relname LIKE :prefix"
+            ),
+            {"prefix": f"{self.table}\\_y%"},
+        )
+
+        return [
+            date(int(match[1]), int(match[2]), 1)
+            for name in names
+            if (match := self._name_pattern.fullmatch(name))
+        ]
+
+    async def archive(
+        self,
+        engine: AsyncEngine,
+        before: date,
+        export_dir: Path | None = None,
+    ) -> list[str]:
+        """Detach partitions of the months ending before the given date.
+
+        With an export directory, each one is also written there as gzipped
+        csv and dropped, along with partitions an earlier run detached but
+        failed to export. Without, detached tables stay in the database,
+        readable by name but out of the table's indexes and scans.
+
+        Every partition is detached in its own transaction, so the table is
+        locked only briefly and a failed export keeps earlier ones archived.
+        """
+        async with engine.connect() as connection:
+            attached = await self.months(connection)
+            detached = await self._detached(connection) if export_dir else []
+
+        archived = []
+
+        for month in sorted({*attached, *detached}):
+            if _add_months(month, 1) > before:
+                break
+
+            name = self._name(month)
+            if month in attached:
+                async with engine.begin() as connection:
+                    await connection.execute(
+                        text(f"ALTER TABLE {self.table} DETACH PARTITION {name}")
+                    )
+
+            if export_dir is not None:
+                async with engine.begin() as connection:
+                    await self._export(connection, name, export_dir / f"{name}.csv.gz")
+                    await connection.execute(text(f"DROP TABLE {name}"))
+
+            archived.append(name)
+
+        return archived
+
+    async def _export(self, connection: AsyncConnection, name: str, path: Path):
+        driver_connection = (await connection.get_raw_connection()).driver_connection
+        # Only complete exports get the final name
+        partial = path.with_name(f"{path.name}.partial")
+
+        try:
+            with gzip.open(partial, "wb") as file:
+
+                async def write(chunk: bytes):
+                    file.write(chunk)
+
+                await driver_connection.copy_from_table(
+                    name, output=write, format="csv", header=True
+                )
+        except BaseException:
+            partial.unlink(missing_ok=True)
+            raise
+
+        partial.replace(path)
+
+
+shipment_event_partitions = MonthlyPartitions(
+    "shipment_event", months_ahead=app_settings.PARTITION_MONTHS_AHEAD
+)
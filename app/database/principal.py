@@ -0,0 +1,69 @@
+from uuid import UUID
+
+from pydantic import BaseModel
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlmodel import SQLModel
+
+from app.config import security_settings
+from app.core.cache import TTLCache
+from app.database.redis import (
+    cache_principal,
+    delete_cached_principal,
+    get_cached_principal,
+)
+
+
+class PrincipalCache:
+    """Profile snapshots of authenticated users.
+
+    Looked up in a short lived in-process LRU, then redis, then postgres.
+    """
+
+    def __init__(self, max_size: int, ttl: int, redis_ttl: int):
+        self.redis_ttl = redis_ttl
+        self._local = TTLCache(max_size=max_size, ttl=ttl)
+
+    @staticmethod
+    def _key(model: type[SQLModel], id: UUID) -> str:
+        return f"principal:{model.__tablename__}:{id}"
+
+    async def get(
+        self,
+        session: AsyncSession,
+        model: type[SQLModel],
+        principal_class: type[BaseModel],
+        id: UUID,
+    ) -> BaseModel | None:
+        key = self._key(model, id)
+
+        principal = self._local.get(key)
+        if principal is not None:
+            return principal
+
+        data = await get_cached_principal(key)
+        if data is not None:
+            principal = principal_class.model_validate_json(data)
+        else:
+            user = await session.get(model, id)
+            if user is None:
+                return None
+
+            principal = principal_class.model_validate(user, from_attributes=True)
+            await cache_principal(key, principal.model_dump_json(), self.redis_ttl)
+
+        self._local.set(key, principal)
+        return principal
+
+    async def invalidate(self, model: type[SQLModel], id: UUID):
+        # Other workers keep their copy until it expires locally
+        key = self._key(model, id)
+
+        self._local.pop(key)
+        await delete_cached_principal(key)
+
+
+principal_cache = PrincipalCache(
+    max_size=security_settings.PRINCIPAL_CACHE_SIZE,
+    ttl=security_settings.PRINCIPAL_CACHE_TTL,
+    redis_ttl=security_settings.PRINCIPAL_CACHE_REDIS_TTL,
+)
@@ -1,18 +1,324 @@
-from redis.asyncio import Redis
+import asyncio
+import json
+from collections import defaultdict
+from contextlib import asynccontextmanager, suppress
+from datetime import datetime
+from math import ceil
+from time import time
+from typing import AsyncIterator
+from uuid import UUID, uuid4
 
-from app.config import db_settings
+from redis.asyncio import BlockingConnectionPool, Redis
+from redis.asyncio.client import Pipeline
+from redis.exceptions import RedisError
 
+from app.config import app_settings, db_settings, security_settings
+from app.core.cache import TTLCache
+from app.utils import forget_access_token
 
-_token_blacklist = Redis(
-    host=db_settings.REDIS_HOST,
-    port=int(db_settings.REDIS_PORT),
-    db=0,
+
+class RedisClients:
+    """Redis client per database, each over its own pool configured from settings.
+
+    Started and closed by the app lifespan. Outside of it, e.g. in commands,
+    clients are created on first use.
+    """
+
+    def __init__(self):
+        self._clients: dict[int, Redis] = {}
+
+    def get(self, db: int) -> Redis:
+        client = self._clients.get(db)
+
+        if client is None:
+            # Waits for a free connection instead of failing when all are in use,
+            # hiredis parses replies when installed
+            client = self._clients[db] = Redis.from_pool(
+                BlockingConnectionPool(
+                    host=db_settings.REDIS_HOST,
+                    port=int(db_settings.REDIS_PORT),
+                    db=db,
+                    max_connections=db_settings.REDIS_MAX_CONNECTIONS,
+                    timeout=db_settings.REDIS_POOL_TIMEOUT,
+                    socket_timeout=db_settings.REDIS_SOCKET_TIMEOUT,
+                    socket_connect_timeout=db_settings.REDIS_SOCKET_CONNECT_TIMEOUT,
+                    socket_keepalive=True,
+                    health_check_interval=db_settings.REDIS_HEALTH_CHECK_INTERVAL,
+                )
+            )
+
+        return client
+
+    def pipeline(self, db: int, transaction: bool = False) -> Pipeline:
+        """Queue several commands, sent in one round trip by execute()"""
+        return self.get(db).pipeline(transaction=transaction)
+
+    async def start(self):
+        # Fail at startup rather than on the first request
+        for db in (
+            db_settings.REDIS_BLACKLIST_DB,
+            db_settings.REDIS_PRINCIPAL_DB,
+            db_settings.REDIS_RATE_LIMIT_DB,
+            db_settings.REDIS_TRACKING_DB,
+            db_settings.REDIS_RESPONSE_CACHE_DB,
+            db_settings.REDIS_COVERAGE_DB,
+        ):
+            await self.get(db).ping()
+
+    async def stop(self):
+        clients, self._clients = self._clients, {}
+
+        for client in clients.values():
+            await client.aclose()
+
+
+redis_clients = RedisClients()
+
+BLACKLIST_CHANNEL = "jti_blacklist"
+
+
+class _BlacklistListener:
+    """Keeps a local cache of tokens known not to be blacklisted.
+
+    Blacklisting publishes the jti, every worker drops it from its cache.
+    While unsubscribed the cache is bypassed, since events could be missed.
+    """
+
+    def __init__(self, max_size: int, ttl: int):
+        self.not_blacklisted = TTLCache(max_size=max_size, ttl=ttl)
+        self.subscribed = False
+        # Bumped per event, so a lookup racing one is not cached
+        self.events = 0
+
+    def discard(self, jti: str):
+        self.events += 1
+        self.not_blacklisted.pop(jti)
+        forget_access_token(jti)
+
+    async def listen(self):
+        while True:
+            try:
+                client = redis_clients.get(db_settings.REDIS_BLACKLIST_DB)
+
+                async with client.pubsub() as pubsub:
+                    await pubsub.subscribe(BLACKLIST_CHANNEL)
+
+                    self.not_blacklisted.clear()
+                    self.subscribed = True
+
+                    # Wake up at least every health check interval,
+                    # so a dead subscription is noticed and replaced
+                    while True:
+                        message = await pubsub.get_message(
+                            ignore_subscribe_messages=True,
+                            timeout=db_settings.REDIS_HEALTH_CHECK_INTERVAL,
+                        )
+                        if message is not None:
+                            self.discard(message["data"].decode())
+            except RedisError:
+                await asyncio.sleep(1)
+            finally:
+                self.subscribed = False
+
+
+_blacklist_listener = _BlacklistListener(
+    max_size=security_settings.BLACKLIST_CACHE_SIZE,
+    ttl=security_settings.BLACKLIST_CACHE_TTL,
 )
 
 
-async def add_jti_to_blacklist(jti: str):
-    await _token_blacklist.set(jti, "blacklisted")
+async def listen_for_blacklisted_jtis():
+    await _blacklist_listener.listen()
+
+
+TRACKING_CHANNEL = "shipment_tracking"
+
+
+class _TrackingHub:
+    """Fans tracking events out to the clients connected to this worker.
+
+    Every worker holds a single subscription for all shipments, and hands
+    each event to the queues of the clients tracking that shipment.
+    """
+
+    def __init__(self, queue_size: int):
+        self.queue_size = queue_size
+        self._queues: dict[str, set[asyncio.Queue]] = defaultdict(set)
+
+    @asynccontextmanager
+    async def subscribe(self, shipment_id: UUID) -> AsyncIterator[asyncio.Queue]:
+        key = str(shipment_id)
+        queue = asyncio.Queue(self.queue_size)
+        self._queues[key].add(queue)
+
+        try:
+            yield queue
+        finally:
+            self._queues[key].discard(queue)
+            if not self._queues[key]:
+                del self._queues[key]
+
+    def dispatch(self, event: dict):
+        for queue in self._queues.get(event["shipment_id"], ()):
+            # A slow client misses events rather than holding up the rest
+            with suppress(asyncio.QueueFull):
+                queue.put_nowait(event)
+
+    async def listen(self):
+        while True:
+            try:
+                client = redis_clients.get(db_settings.REDIS_TRACKING_DB)
+
+                async with client.pubsub() as pubsub:
+                    await pubsub.subscribe(TRACKING_CHANNEL)
+
+                    while True:
+                        message = await pubsub.get_message(
+                            ignore_subscribe_messages=True,
+                            timeout=db_settings.REDIS_HEALTH_CHECK_INTERVAL,
+                        )
+                        if message is not None:
+                            self.dispatch(json.loads(message["data"]))
+            except RedisError:
+                await asyncio.sleep(1)
+
+
+tracking_hub = _TrackingHub(queue_size=app_settings.TRACKING_QUEUE_SIZE)
+
+
+async def listen_for_tracking_events():
+    await tracking_hub.listen()
+
+
+async def publish_tracking_events(events: list[dict]):
+    async with redis_clients.pipeline(db_settings.REDIS_TRACKING_DB) as pipe:
+        for event in events:
+            pipe.publish(TRACKING_CHANNEL, json.dumps(event))
+        await pipe.execute()
+
+
+async def add_jti_to_blacklist(jti: str, expires_at: int):
+    # Expired tokens are rejected anyway, keep the entry only until then
+    ttl = max(expires_at - int(time()), 1)
+
+    async with redis_clients.pipeline(db_settings.REDIS_BLACKLIST_DB) as pipe:
+        pipe.set(jti, "blacklisted", ex=ttl)
+        pipe.publish(BLACKLIST_CHANNEL, jti)
+        await pipe.execute()
+
+    _blacklist_listener.discard(jti)
 
 
 async def is_jti_blacklisted(jti: str) -> bool:
-    return await _token_blacklist.exists(jti)
+    if _blacklist_listener.subscribed and jti in _blacklist_listener.not_blacklisted:
+        return False
+
+    events = _blacklist_listener.events
+    blacklisted = bool(
+        await redis_clients.get(db_settings.REDIS_BLACKLIST_DB).exists(jti)
+    )
+
+    if (
+        not blacklisted
+        and _blacklist_listener.subscribed
+        and events == _blacklist_listener.events
+    ):
+        _blacklist_listener.not_blacklisted.set(jti, True)
+
+    return blacklisted
+
+
+async def get_cached_principal(key: str) -> bytes | None:
+    return await redis_clients.get(db_settings.REDIS_PRINCIPAL_DB).get(key)
+
+
+async def cache_principal(key: str, data: str, ttl: int):
+    await redis_clients.get(db_settings.REDIS_PRINCIPAL_DB).set(key, data, ex=ttl)
+
+
+async def delete_cached_principal(key: str):
+    await redis_clients.get(db_settings.REDIS_PRINCIPAL_DB).delete(key)
+
+
+async def hit_rate_limits(limits: list[tuple[str, int]], window: int) -> int:
+    """Record a hit on each (key, limit) sliding window, in one round trip.
+
+    Returns the seconds until every window allows another hit, 0 if this
+    hit was allowed. Rejected hits count too, so hammering keeps a client out.
+    """
+    now = time() * 1000
+    window_ms = window * 1000
+
+    async with redis_clients.pipeline(db_settings.REDIS_RATE_LIMIT_DB) as pipe:
+        for key, limit in limits:
+            pipe.zremrangebyscore(key, 0, now - window_ms)
+            pipe.zadd(key, {uuid4().hex: now})
+            pipe.zcard(key)
+            # Only the newest hits up to the limit decide when the next is allowed
+            pipe.zremrangebyrank(key, 0, -limit - 1)
+            pipe.zrange(key, 0, 0, withscores=True)
+            pipe.pexpire(key, window_ms)
+        results = await pipe.execute()
+
+    retry_after = 0
+    for index, (key, limit) in enumerate(limits):
+        hits, oldest = results[index * 6 + 2], results[index * 6 + 4]
+
+        if hits > limit:
+            retry_after = max(
+                retry_after, ceil((oldest[0][1] + window_ms - now) / 1000)
+            )
+
+    return retry_after
+
+
+def _shipment_key(shipment_id: UUID, *parts) -> str:
+    return ":".join(("shipment", str(shipment_id), *map(str, parts)))
+
+
+async def get_cached_shipment_version(shipment_id: UUID) -> int | None:
+    version = await redis_clients.get(db_settings.REDIS_RESPONSE_CACHE_DB).zscore(
+        _shipment_key(shipment_id, "version"), "version"
+    )
+
+    return int(version) if version is not None else None
+
+
+async def cache_shipment_versions(versions: dict[UUID, int]):
+    async with redis_clients.pipeline(db_settings.REDIS_RESPONSE_CACHE_DB) as pipe:
+        for shipment_id, version in versions.items():
+            key = _shipment_key(shipment_id, "version")
+            # The score only ever moves up, so a read that loaded a version
+            # before a change cannot cache it over the newer one
+            pipe.zadd(key, {"version": version}, gt=True)
+            pipe.expire(key, app_settings.SHIPMENT_VERSION_CACHE_TTL)
+        await pipe.execute()
+
+
+async def get_cached_shipment_response(
+    shipment_id: UUID, version: int, representation: str
+) -> tuple[bytes, datetime] | None:
+    body, updated_at = await redis_clients.get(
+        db_settings.REDIS_RESPONSE_CACHE_DB
+    ).hmget(_shipment_key(shipment_id, version, representation), "body", "updated_at")
+
+    if body is None or updated_at is None:
+        return None
+
+    return body, datetime.fromisoformat(updated_at.decode())
+
+
+async def cache_shipment_response(
+    shipment_id: UUID,
+    version: int,
+    representation: str,
+    body: bytes,
+    updated_at: datetime,
+):
+    # A version never changes, so entries only expire
+    key = _shipment_key(shipment_id, version, representation)
+
+    async with redis_clients.pipeline(db_settings.REDIS_RESPONSE_CACHE_DB) as pipe:
+        pipe.hset(key, mapping={"body": body, "updated_at": updated_at.isoformat()})
+        pipe.expire(key, app_settings.SHIPMENT_RESPONSE_CACHE_TTL)
+        await pipe.execute()
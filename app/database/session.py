@@ -1,30 +1,71 @@
+from time import perf_counter
 
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
-from sqlalchemy.orm import sessionmaker
+from prometheus_client import Gauge, Histogram
+from sqlalchemy.ext.asyncio import (
+    AsyncSession,
+    async_sessionmaker,
+    create_async_engine,
+)
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from sqlmodel import SQLModel
 
 from app.config import db_settings
 
+POOL_CHECKOUT_WAIT = Histogram(
+    "db_pool_checkout_wait_seconds",
+    "Time spent waiting for a connection from the database pool",
+)
+POOL_CHECKED_OUT = Gauge(
+    "db_pool_checked_out_connections",
+    "Database connections currently checked out of the pool",
+)
+
+
+class InstrumentedPool(AsyncAdaptedQueuePool):
+    """Queue pool reporting how long each checkout waits for a connection"""
+
+    def _do_get(self):
+        start = perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            POOL_CHECKOUT_WAIT.observe(perf_counter() - start)
+
+
 engine = create_async_engine(
     url=db_settings.POSTGRES_URL,
     # Log sql queries
-    echo=True
+    echo=db_settings.POSTGRES_ECHO,
+    poolclass=InstrumentedPool,
+    pool_size=db_settings.POSTGRES_POOL_SIZE,
+    max_overflow=db_settings.POSTGRES_MAX_OVERFLOW,
+    pool_timeout=db_settings.POSTGRES_POOL_TIMEOUT,
+    pool_recycle=db_settings.POSTGRES_POOL_RECYCLE,
+    pool_pre_ping=db_settings.POSTGRES_POOL_PRE_PING,
+    connect_args={
+        "statement_cache_size": db_settings.POSTGRES_STATEMENT_CACHE_SIZE,
+        "server_settings": {
+            "statement_timeout": str(db_settings.POSTGRES_STATEMENT_TIMEOUT),
+        },
+    },
+)
+
+POOL_CHECKED_OUT.set_function(lambda: engine.pool.checkedout())
+
+async_session = async_sessionmaker(
+    bind=engine,
+    class_=AsyncSession,
+    expire_on_commit=False,
 )
 
 
 async def create_db_tables():
     async with engine.begin() as connection:
         from app.database.models import Shipment  # noqa: F401
+
         await connection.run_sync(SQLModel.metadata.create_all)
 
 
 async def get_session():
-    async_session = sessionmaker(
-        bind=engine,
-        class_=AsyncSession,
-        expire_on_commit=False
-    )
-
     async with async_session() as session:
         yield session
-
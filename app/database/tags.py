@@ -0,0 +1,31 @@
+from uuid import UUID
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlmodel import select
+
+from app.core.exceptions import EntityNotFound
+from app.database.models import Tag, TagName
+
+
+class TagRegistry:
+    """In-process map of tag names to the ids of the fixed tag rows"""
+
+    def __init__(self):
+        self._ids: dict[TagName, UUID] = {}
+
+    async def refresh(self, session: AsyncSession):
+        result = await session.execute(select(Tag.id, Tag.name))
+        self._ids = {name: id for id, name in result}
+
+    async def id(self, session: AsyncSession, tag_name: TagName) -> UUID:
+        # Pick up tags inserted after the last refresh
+        if tag_name not in self._ids:
+            await self.refresh(session)
+
+        if tag_name not in self._ids:
+            raise EntityNotFound
+
+        return self._ids[tag_name]
+
+
+tag_registry = TagRegistry()
@@ -1,19 +1,61 @@
-from contextlib import asynccontextmanager
+import asyncio
+import logging
+from contextlib import asynccontextmanager, suppress
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from prometheus_client import make_asgi_app
 from scalar_fastapi import get_scalar_api_reference
+from sqlalchemy.exc import SQLAlchemyError
 
 from app.api.tag import APITag
 from app.core.exceptions import add_exception_handlers
-from app.database.session import create_db_tables
+from app.core.templates import preload_templates
+from app.database.coverage import listen_for_coverage_changes, zipcode_index
+from app.database.partitions import shipment_event_partitions
+from app.database.redis import (
+    listen_for_blacklisted_jtis,
+    listen_for_tracking_events,
+    redis_clients,
+)
+from app.database.session import async_session, create_db_tables, engine
+from app.database.tags import tag_registry
 from app.api.router import master_router
 
+logger = logging.getLogger(__name__)
+
 
 @asynccontextmanager
 async def lifespan_handler(app: FastAPI):
     await create_db_tables()
+    try:
+        async with engine.begin() as connection:
+            await shipment_event_partitions.create(connection)
+    except SQLAlchemyError:
+        # The create-partitions command retries daily, rows land in the
+        # default partition meanwhile
+        logger.exception("Creating shipment event partitions failed")
+    await redis_clients.start()
+    preload_templates()
+
+    # Warm in-process lookups
+    async with async_session() as session:
+        await zipcode_index.load(session)
+        await tag_registry.refresh(session)
+
+    listeners = [
+        asyncio.create_task(listen_for_blacklisted_jtis()),
+        asyncio.create_task(listen_for_tracking_events()),
+        asyncio.create_task(listen_for_coverage_changes()),
+    ]
+
     yield
 
+    for listener in listeners:
+        listener.cancel()
+        with suppress(asyncio.CancelledError):
+            await listener
+    await redis_clients.stop()
+
 
 description = """
 Delivery Management System for sellers and delivery agents
@@ -53,6 +95,7 @@ app.add_middleware(
 )
 
 app.include_router(master_router)
+app.mount("/metrics", make_asgi_app())
 add_exception_handlers(app)
 
 
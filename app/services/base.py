@@ -8,8 +8,16 @@ class BaseService:
         self.model = model
         self.session = session
 
-    async def _get(self, id: UUID):
-        return await self.session.get(self.model, id)
+    async def _get(self, id: UUID, *options, lock: bool = False):
+        # Loader options, and a lock's fresh row, also apply to an instance
+        # already in the session
+        return await self.session.get(
+            self.model,
+            id,
+            options=options,
+            populate_existing=bool(options) or lock,
+            with_for_update=lock,
+        )
 
     async def _add(self, entity: SQLModel):
         self.session.add(entity)
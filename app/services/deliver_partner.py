@@ -1,43 +1,184 @@
-from typing import Sequence
-from fastapi import BackgroundTasks, HTTPException, status
-from sqlmodel import any_, select
+from datetime import datetime
+from enum import Enum
+from typing import Iterable, Sequence
+from uuid import UUID
+from sqlalchemy import Float, cast, func, update
+from sqlmodel import select
 from app.api.schemas.delivery_partner import DeliveryPartnerCreate
-from app.core.exceptions import DeliveryPartnerNotAvailable
-from app.database.models import DeliveryPartner, Shipment
+from app.config import app_settings
+from app.core.exceptions import DeliveryPartnerNotAvailable, EntityNotFound
+from app.database.coverage import zipcode_index
+from app.database.principal import principal_cache
+from app.database.models import (
+    INACTIVE_SHIPMENT_STATUSES,
+    DeliveryPartner,
+    Shipment,
+    ShipmentStatus,
+)
 from app.services.user import UserService
 from sqlalchemy.ext.asyncio import AsyncSession
 
 
+class AssignmentPolicy(str, Enum):
+    FIRST_FIT = "first_fit"
+    LEAST_LOADED = "least_loaded"
+    ROUND_ROBIN = "round_robin"
+
+    def order_by(self) -> tuple:
+        match self:
+            case AssignmentPolicy.LEAST_LOADED:
+                return (
+                    cast(DeliveryPartner.active_shipment_count, Float)
+                    / DeliveryPartner.max_handling_capacity,
+                    DeliveryPartner.id,
+                )
+            case AssignmentPolicy.ROUND_ROBIN:
+                return (
+                    DeliveryPartner.last_assigned_at.asc().nulls_first(),
+                    DeliveryPartner.id,
+                )
+            case _:
+                return (DeliveryPartner.created_at, DeliveryPartner.id)
+
+
 class DeliveryPartnerService(UserService):
-    def __init__(self, session: AsyncSession, tasks: BackgroundTasks):
-        super().__init__(DeliveryPartner, session, tasks)
+    def __init__(
+        self,
+        session: AsyncSession,
+        policy: AssignmentPolicy = AssignmentPolicy(
+            app_settings.PARTNER_ASSIGNMENT_POLICY
+        ),
+    ):
+        super().__init__(DeliveryPartner, session)
+        self.policy = policy
 
     async def add(self, delivery_partner: DeliveryPartnerCreate):
-        return await self._add_user(
+        partner = await self._add_user(
             delivery_partner.model_dump(), router_prefix="partner"
         )
+        await zipcode_index.publish(partner.id, partner.serviceable_zip_codes)
+
+        return partner
+
+    async def assign_shipment(self, shipment: Shipment):
+        partners = await self.reserve_capacity(shipment.destination)
 
-    async def get_partner_by_zipcode(self, zipcode: int) -> Sequence[DeliveryPartner]:
+        if not partners:
+            raise DeliveryPartnerNotAvailable
+
+        return partners[0]
+
+    async def reserve_capacity(
+        self, zipcode: int, count: int = 1
+    ) -> list[DeliveryPartner]:
+        """Reserve up to count shipment slots for the zipcode.
+
+        Returns the partner of each reserved slot. Reserved partners stay
+        row locked until the session commits.
+        """
+        await zipcode_index.ensure_loaded(self.session)
+
+        partner_ids = zipcode_index.partners(zipcode)
+        reserved: list[DeliveryPartner] = []
+
+        # Take partners no other request holds first,
+        # then wait on the locked ones only if still short
+        for skip_locked in (True, False):
+            if not partner_ids or len(reserved) == count:
+                break
+
+            for partner in await self._lock_partners(
+                partner_ids, zipcode, count - len(reserved), skip_locked
+            ):
+                slots = min(partner.current_handling_capacity, count - len(reserved))
+
+                await self.session.execute(
+                    update(DeliveryPartner)
+                    .where(DeliveryPartner.id == partner.id)
+                    .values(
+                        active_shipment_count=DeliveryPartner.active_shipment_count
+                        + slots,
+                        last_assigned_at=datetime.now(),
+                    )
+                )
+                reserved.extend([partner] * slots)
+
+                if len(reserved) == count:
+                    break
+
+            partner_ids = partner_ids - {partner.id for partner in reserved}
+
+        return reserved
+
+    async def lock_coverage(self, zipcodes: Iterable[int]):
+        """Lock every partner covering the zipcodes, in id order.
+
+        Taken before reserving capacity for several zipcodes in one
+        transaction. Concurrent batches then wait on each other instead of
+        each holding partners the other needs.
+        """
+        await zipcode_index.ensure_loaded(self.session)
+
+        partner_ids = set().union(
+            *(zipcode_index.partners(zipcode) for zipcode in zipcodes)
+        )
+        if partner_ids:
+            await self.session.execute(
+                select(DeliveryPartner.id)
+                .where(DeliveryPartner.id.in_(partner_ids))
+                .order_by(DeliveryPartner.id)
+                .with_for_update()
+            )
+
+    async def _lock_partners(
+        self, partner_ids: set[UUID], zipcode: int, limit: int, skip_locked: bool
+    ) -> Sequence[DeliveryPartner]:
         return (
             await self.session.scalars(
-                select(DeliveryPartner).where(
-                    zipcode == any_(DeliveryPartner.serviceable_zip_codes)
+                select(DeliveryPartner)
+                .where(
+                    DeliveryPartner.id.in_(partner_ids),
+                    DeliveryPartner.serviceable_zip_codes.contains([zipcode]),
+                    DeliveryPartner.active_shipment_count
+                    < DeliveryPartner.max_handling_capacity,
                 )
+                .order_by(*self.policy.order_by())
+                .limit(limit)
+                .with_for_update(skip_locked=skip_locked)
+                .execution_options(populate_existing=True)
             )
         ).all()
 
-    async def assign_shipment(self, shipment: Shipment):
-        eligible_partners = await self.get_partner_by_zipcode(shipment.destination)
+    async def repair_active_shipment_counts(self):
+        active_shipments = (
+            select(func.count())
+            .select_from(Shipment)
+            .where(
+                Shipment.delivery_partner_id == DeliveryPartner.id,
+                func.coalesce(Shipment.current_status, ShipmentStatus.placed).not_in(
+                    INACTIVE_SHIPMENT_STATUSES
+                ),
+            )
+            .scalar_subquery()
+        )
+
+        await self.session.execute(
+            update(DeliveryPartner).values(active_shipment_count=active_shipments),
+            execution_options={"synchronize_session": False},
+        )
+        await self.session.commit()
+
+    async def update(self, id: UUID, partner_update: dict):
+        partner = await self._get(id)
 
-        for partner in eligible_partners:
-            if partner.current_handling_capacity > 0:
-                partner.shipments.append(shipment)
-                return partner
+        if partner is None:
+            raise EntityNotFound
 
-        raise DeliveryPartnerNotAvailable
+        partner = await self._update(partner.sqlmodel_update(partner_update))
+        await zipcode_index.publish(partner.id, partner.serviceable_zip_codes)
+        await principal_cache.invalidate(DeliveryPartner, partner.id)
 
-    async def update(self, partner: DeliveryPartner):
-        return await self._update(partner)
+        return partner
 
     async def token(self, email, password) -> str:
         return await self._generate_token(email=email, password=password)
@@ -1,29 +1,21 @@
-from fastapi import BackgroundTasks
-from fastapi_mail import ConnectionConfig, FastMail, MessageSchema, MessageType
+from celery import Signature, group
+from fastapi.concurrency import run_in_threadpool
 from pydantic import EmailStr
 
-from app.config import notification_settings
-from app.utils import TEMPLATE_DIR
+from app.worker.tasks import app as celery_app
+from app.worker.tasks import (
+    send_email_with_template,
+    send_emails_with_template,
+    send_mail,
+)
 
 
 class NotificationService:
-    def __init__(self, tasks: BackgroundTasks):
-        self.tasks = tasks
-        self.fastmail = FastMail(
-            ConnectionConfig(
-                **notification_settings.model_dump(), TEMPLATE_FOLDER=TEMPLATE_DIR
-            )
-        )
+    """Queues emails for the worker, never waits on the mail server itself"""
 
     async def send_email(self, recipients: list[EmailStr], subject: str, body: str):
-        self.tasks.add_task(
-            self.fastmail.send_message,
-            message=MessageSchema(
-                recipients=recipients,
-                subject=subject,
-                body=body,
-                subtype=MessageType.plain,
-            ),
+        await self._enqueue(
+            send_mail.s(recipients=recipients, subject=subject, body=body)
         )
 
     async def send_email_with_template(
@@ -33,13 +25,36 @@ class NotificationService:
         context: dict,
         template_name: str,
     ):
-        self.tasks.add_task(
-            self.fastmail.send_message,
-            message=MessageSchema(
+        await self._enqueue(
+            send_email_with_template.s(
                 recipients=recipients,
                 subject=subject,
-                template_body=context,
-                subtype=MessageType.html,
-            ),
-            template_name=template_name,
+                context=context,
+                template_name=template_name,
+            )
         )
+
+    async def send_tasks(self, tasks: list[tuple[str, dict]]):
+        """Queue tasks given by name and keyword arguments, e.g. from the outbox.
+
+        Templated emails among them go out as one batch task, sent over
+        the worker's pooled smtp connections.
+        """
+        emails = [
+            kwargs for name, kwargs in tasks if name == send_email_with_template.name
+        ]
+        signatures = [
+            celery_app.signature(name, kwargs=kwargs)
+            for name, kwargs in tasks
+            if name != send_email_with_template.name
+        ]
+        if emails:
+            signatures.append(send_emails_with_template.s(emails))
+
+        if signatures:
+            await self._enqueue(group(signatures))
+
+    @staticmethod
+    async def _enqueue(signature: Signature):
+        # Publishing to the broker is blocking io, keep it off the event loop
+        await run_in_threadpool(signature.delay)
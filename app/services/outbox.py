@@ -0,0 +1,51 @@
+from sqlalchemy import delete, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database.models import Outbox
+from app.services.base import BaseService
+from app.services.notification import NotificationService
+
+
+class OutboxService(BaseService):
+    def __init__(self, session: AsyncSession):
+        super().__init__(Outbox, session)
+        self.notification_service = NotificationService()
+
+    def add(self, task: str, payload: dict):
+        # Written by the session's next commit, along with the change itself
+        self.session.add(Outbox(task=task, payload=payload))
+
+    async def add_many(self, tasks: list[tuple[str, dict]]):
+        if tasks:
+            await self.session.execute(
+                insert(Outbox),
+                [{"task": task, "payload": payload} for task, payload in tasks],
+            )
+
+    async def relay(self, batch_size: int) -> int:
+        """Send up to batch_size outbox tasks to the worker, oldest first.
+
+        Rows are locked with SKIP LOCKED so several relays split the outbox,
+        and deleted only after the worker queue accepted them. A relay dying
+        in between sends them again, delivery is at least once.
+        """
+        entries = (
+            await self.session.scalars(
+                select(Outbox)
+                .order_by(Outbox.created_at)
+                .limit(batch_size)
+                .with_for_update(skip_locked=True)
+            )
+        ).all()
+
+        if entries:
+            await self.notification_service.send_tasks(
+                [(entry.task, entry.payload) for entry in entries]
+            )
+            await self.session.execute(
+                delete(Outbox).where(Outbox.id.in_([entry.id for entry in entries]))
+            )
+
+        await self.session.commit()
+
+        return len(entries)
@@ -3,17 +3,12 @@ from fastapi import BackgroundTasks, HTTPException, status
 from app.services.user import UserService
 from app.utils import generate_access_token
 
-from passlib.context import CryptContext
-
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.api.schemas.seller import SellerCreate
 from app.database.models import Seller
 
-password_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
-
 class SellerService(UserService):
     def __init__(self, session: AsyncSession):
         super().__init__(Seller, session)
@@ -1,22 +1,62 @@
+from collections import defaultdict
+from contextlib import suppress
 from datetime import datetime, timedelta
-from uuid import UUID
+from itertools import zip_longest
+from typing import AsyncIterator
+from uuid import UUID, uuid4
 from fastapi import HTTPException, status
+from redis.exceptions import RedisError
+from sqlalchemy import delete, exists, insert, select, tuple_, update
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
-
-from app.api.schemas.shipment import ShipmentCreate, ShipmentReview, ShipmentUpdate
-from app.core.exceptions import ClientNotAuthorized, EntityNotFound
+from sqlalchemy.orm import selectinload
+from sqlalchemy.orm.attributes import set_committed_value
+
+from app.api.schemas.shipment import (
+    ShipmentCreate,
+    ShipmentFilter,
+    ShipmentReview,
+    ShipmentScan,
+    ShipmentUpdate,
+)
+from app.core.exceptions import (
+    ClientNotAuthorized,
+    DeliveryPartnerNotAvailable,
+    EntityNotFound,
+    InvalidCursor,
+    NothingToUpdate,
+    ShipmentClosed,
+)
+from app.core.security import PartnerPrincipal, SellerPrincipal
 from app.database.models import (
-    DeliveryPartner,
+    INACTIVE_SHIPMENT_STATUSES,
     Review,
     Seller,
     Shipment,
+    ShipmentEvent,
     ShipmentStatus,
+    ShipmentTag,
     TagName,
 )
+from app.database.redis import (
+    cache_shipment_response,
+    get_cached_shipment_response,
+    get_cached_shipment_version,
+)
+from app.database.tags import tag_registry
 from app.services.base import BaseService
 from app.services.deliver_partner import DeliveryPartnerService
 from app.services.shipment_event import ShipmentEventService
-from app.utils import decode_url_safe_token
+from app.utils import decode_cursor, decode_url_safe_token, encode_cursor
+
+# Relationships serialized by ShipmentRead
+SHIPMENT_READ_OPTIONS = (selectinload(Shipment.timeline), selectinload(Shipment.tags))
+# Relationships rendered by the tracking page
+SHIPMENT_TRACKING_OPTIONS = (
+    selectinload(Shipment.timeline),
+    selectinload(Shipment.delivery_partner),
+)
 
 
 class ShipmentService(BaseService):
@@ -30,13 +70,165 @@ class ShipmentService(BaseService):
         self.partner_service = partner_service
         self.event_service = event_service
 
-    async def get(self, id: UUID) -> Shipment | None:
-        return await self._get(id)
+    async def get(self, id: UUID, *options, lock: bool = False) -> Shipment | None:
+        return await self._get(id, *options, lock=lock)
+
+    async def get_version(self, id: UUID) -> int | None:
+        with suppress(RedisError):
+            version = await get_cached_shipment_version(id)
+            if version is not None:
+                return version
+
+        version = await self.session.scalar(
+            select(Shipment.version).where(Shipment.id == id)
+        )
+        if version is not None:
+            await self.event_service._cache_versions({id: version})
+
+        return version
+
+    async def get_cached_response(
+        self, id: UUID, version: int, representation: str
+    ) -> tuple[bytes, datetime] | None:
+        """A read of the shipment rendered at the version, with its updated_at"""
+        with suppress(RedisError):
+            return await get_cached_shipment_response(id, version, representation)
+
+    async def cache_response(
+        self, shipment: Shipment, representation: str, body: bytes
+    ):
+        with suppress(RedisError):
+            await cache_shipment_response(
+                shipment.id,
+                shipment.version,
+                representation,
+                body,
+                shipment.updated_at,
+            )
+
+    async def get_page(
+        self,
+        seller: SellerPrincipal,
+        filters: ShipmentFilter,
+        limit: int,
+        cursor: str | None = None,
+    ) -> dict:
+        query = select(Shipment).where(Shipment.seller_id == seller.id)
+
+        if filters.status:
+            query = query.where(Shipment.current_status == filters.status)
+        if filters.tag:
+            tag_id = await tag_registry.id(self.session, filters.tag)
+            query = query.where(
+                exists().where(
+                    ShipmentTag.shipment_id == Shipment.id,
+                    ShipmentTag.tag_id == tag_id,
+                )
+            )
+        if filters.destination:
+            query = query.where(Shipment.destination == filters.destination)
+        if filters.created_after:
+            query = query.where(Shipment.created_at >= filters.created_after)
+        if filters.created_before:
+            query = query.where(Shipment.created_at < filters.created_before)
+
+        # Continue after the last shipment of the previous page
+        if cursor:
+            position = decode_cursor(cursor)
+            try:
+                created_at = datetime.fromisoformat(position["created_at"])
+                id = UUID(position["id"])
+            except (KeyError, TypeError, ValueError):
+                raise InvalidCursor
+
+            query = query.where(
+                tuple_(Shipment.created_at, Shipment.id) < tuple_(created_at, id)
+            )
+
+        # Fetch one extra row to know if there is a next page
+        shipments = (
+            await self.session.scalars(
+                query.order_by(Shipment.created_at.desc(), Shipment.id.desc())
+                .limit(limit + 1)
+                .options(*SHIPMENT_READ_OPTIONS)
+            )
+        ).all()
+
+        next_cursor = None
+        if len(shipments) > limit:
+            shipments = shipments[:limit]
+            next_cursor = encode_cursor(
+                {"created_at": shipments[-1].created_at, "id": shipments[-1].id}
+            )
+
+        return {"items": shipments, "next_cursor": next_cursor}
+
+    async def get_tagged_page(
+        self,
+        seller: SellerPrincipal,
+        tag_name: TagName,
+        limit: int,
+        cursor: str | None = None,
+    ) -> dict:
+        tag_id = await tag_registry.id(self.session, tag_name)
+
+        query = (
+            select(Shipment)
+            .join(ShipmentTag, ShipmentTag.shipment_id == Shipment.id)
+            .where(ShipmentTag.tag_id == tag_id, Shipment.seller_id == seller.id)
+        )
+
+        if cursor:
+            position = decode_cursor(cursor)
+            try:
+                shipment_id = UUID(position["shipment_id"])
+            except (KeyError, TypeError, ValueError):
+                raise InvalidCursor
+
+            query = query.where(ShipmentTag.shipment_id > shipment_id)
+
+        shipments = (
+            await self.session.scalars(
+                query.order_by(ShipmentTag.shipment_id)
+                .limit(limit + 1)
+                .options(*SHIPMENT_READ_OPTIONS)
+            )
+        ).all()
+
+        next_cursor = None
+        if len(shipments) > limit:
+            shipments = shipments[:limit]
+            next_cursor = encode_cursor({"shipment_id": shipments[-1].id})
+
+        return {"items": shipments, "next_cursor": next_cursor}
+
+    async def iter_tagged(
+        self, seller: SellerPrincipal, tag_name: TagName, page_size: int = 100
+    ) -> AsyncIterator[Shipment]:
+        cursor = None
+
+        while True:
+            page = await self.get_tagged_page(seller, tag_name, page_size, cursor)
+
+            # Keep only one page in memory, and return the connection to the
+            # pool while a slow client reads it
+            self.session.expunge_all()
+            await self.session.rollback()
+
+            for shipment in page["items"]:
+                yield shipment
 
-    async def add(self, shipment_create: ShipmentCreate, seller: Seller) -> Shipment:
+            cursor = page["next_cursor"]
+            if cursor is None:
+                return
+
+    async def add(
+        self, shipment_create: ShipmentCreate, seller: SellerPrincipal
+    ) -> Shipment:
         new_shipment = Shipment(
             **shipment_create.model_dump(),
-            status=ShipmentStatus.placed,
+            current_status=ShipmentStatus.placed,
+            current_location=seller.zip_code,
             estimated_delivery=datetime.now() + timedelta(days=3),
             seller_id=seller.id,
         )
@@ -53,16 +245,101 @@ class ShipmentService(BaseService):
             location=seller.zip_code,
             status=ShipmentStatus.placed,
             description=f"assigned to {partner.name}",
+            seller_name=seller.name,
+            partner_name=partner.name,
         )
 
-        shipment.timeline.append(event)
+        # A new shipment has just the placed event and no tags
+        set_committed_value(shipment, "timeline", [event])
+        set_committed_value(shipment, "tags", [])
 
         return shipment
 
+    async def add_batch(
+        self, shipment_creates: list[ShipmentCreate], seller: SellerPrincipal
+    ) -> list[dict]:
+        results: list[dict] = [
+            {"index": index} for index in range(len(shipment_creates))
+        ]
+
+        # Resolve partners once per destination
+        indexes_by_destination = defaultdict(list)
+        for index, shipment_create in enumerate(shipment_creates):
+            indexes_by_destination[shipment_create.destination].append(index)
+
+        shipments: list[Shipment] = []
+        events: list[ShipmentEvent] = []
+        notifications: list[dict] = []
+
+        # Held in id order, so concurrent batches cannot deadlock
+        await self.partner_service.lock_coverage(indexes_by_destination)
+
+        for destination in sorted(indexes_by_destination):
+            indexes = indexes_by_destination[destination]
+            partners = await self.partner_service.reserve_capacity(
+                destination, len(indexes)
+            )
+
+            for index, partner in zip_longest(indexes, partners):
+                if partner is None:
+                    results[index]["error"] = DeliveryPartnerNotAvailable.__doc__
+                    continue
+
+                shipment = Shipment(
+                    **shipment_creates[index].model_dump(),
+                    id=uuid4(),
+                    created_at=datetime.now(),
+                    updated_at=datetime.now(),
+                    estimated_delivery=datetime.now() + timedelta(days=3),
+                    seller_id=seller.id,
+                    delivery_partner_id=partner.id,
+                    current_status=ShipmentStatus.placed,
+                    current_location=seller.zip_code,
+                )
+                event = ShipmentEvent(
+                    id=uuid4(),
+                    created_at=datetime.now(),
+                    location=seller.zip_code,
+                    status=ShipmentStatus.placed,
+                    description=f"assigned to {partner.name}",
+                    shipment_id=shipment.id,
+                )
+
+                shipments.append(shipment)
+                events.append(event)
+                notifications.append(
+                    self.event_service._notification(
+                        shipment,
+                        ShipmentStatus.placed,
+                        seller_name=seller.name,
+                        partner_name=partner.name,
+                    )
+                )
+
+                shipment.timeline = [event]
+                results[index]["shipment"] = shipment
+
+        if shipments:
+            await self.session.execute(
+                insert(Shipment), [shipment.model_dump() for shipment in shipments]
+            )
+            await self.session.execute(
+                insert(ShipmentEvent), [event.model_dump() for event in events]
+            )
+            await self.event_service._notify_batch(notifications)
+
+        # Also releases the reserved partner rows
+        await self.session.commit()
+        await self.event_service._publish(events)
+
+        return results
+
     async def update(
-        self, id: UUID, shipment_update: ShipmentUpdate, partner: DeliveryPartner
+        self, id: UUID, shipment_update: ShipmentUpdate, partner: PartnerPrincipal
     ) -> Shipment:
-        shipment = await self.get(id)
+        # Seller is named in the delivered email. The row stays locked until
+        # the event commits, so concurrent changes count partner load once.
+        shipment = await self.get(id, selectinload(Shipment.seller), lock=True)
 
         if shipment is None:
             raise EntityNotFound
@@ -75,10 +352,119 @@ class ShipmentService(BaseService):
         if shipment_update.estimated_delivery:
             shipment.estimated_delivery = shipment_update.estimated_delivery
 
+        versions = {}
         if len(update) > 1 or not shipment_update.estimated_delivery:
-            await self.event_service.add(shipment=shipment, **update)
+            # Bumps the version along with the new event
+            await self.event_service.add(
+                shipment=shipment, **update, partner_name=partner.name
+            )
+        else:
+            versions = await self.event_service._bump_versions([shipment.id])
+
+        await self._update(shipment)
+        await self.event_service._cache_versions(versions)
+
+        return await self.get(id, *SHIPMENT_READ_OPTIONS)
+
+    async def update_batch(
+        self, scans: list[ShipmentScan], partner: PartnerPrincipal
+    ) -> list[dict]:
+        results: list[dict] = [
+            {"index": index, "id": scan.id} for index, scan in enumerate(scans)
+        ]
+
+        # One query checks ownership of every scanned shipment, rows stay
+        # locked until commit so concurrent scans apply in order
+        rows = (
+            await self.session.execute(
+                select(Shipment, Seller.name)
+                .join(Seller, Shipment.seller_id == Seller.id)
+                .where(Shipment.id.in_({scan.id for scan in scans}))
+                .order_by(Shipment.id)
+                .with_for_update(of=Shipment)
+            )
+        ).all()
+        shipments = {shipment.id: shipment for shipment, _ in rows}
+        seller_names = {shipment.id: seller_name for shipment, seller_name in rows}
+
+        # Latest status and location per shipment, as scans apply in order
+        states = {
+            shipment.id: (shipment.current_status, shipment.current_location)
+            for shipment in shipments.values()
+        }
+        events: list[ShipmentEvent] = []
+        notifications: list[dict] = []
+        load_change = 0
+
+        for scan, result in zip(scans, results):
+            shipment = shipments.get(scan.id)
+
+            if shipment is None:
+                result["error"] = EntityNotFound.__doc__
+                continue
+
+            if shipment.delivery_partner_id != partner.id:
+                result["error"] = ClientNotAuthorized.__doc__
+                continue
+
+            if scan.status is None and scan.location is None:
+                result["error"] = NothingToUpdate.__doc__
+                continue
+
+            previous_status, previous_location = states[scan.id]
+            status = scan.status or previous_status
+            location = scan.location or previous_location
+
+            events.append(
+                ShipmentEvent(
+                    id=uuid4(),
+                    created_at=datetime.now(),
+                    location=location,
+                    status=status,
+                    description=scan.description
+                    or self.event_service._generate_description(status, location),
+                    shipment_id=scan.id,
+                )
+            )
+            notifications.append(
+                self.event_service._notification(
+                    shipment,
+                    status,
+                    seller_name=seller_names[scan.id],
+                    partner_name=partner.name,
+                )
+            )
+            load_change += self.event_service._load_change(previous_status, status)
+
+            states[scan.id] = (status, location)
+            result["status"] = status
+
+        changed = [
+            {"id": id, "current_status": status, "current_location": location}
+            for id, (status, location) in states.items()
+            if (status, location)
+            != (shipments[id].current_status, shipments[id].current_location)
+        ]
+
+        versions = {}
+        if events:
+            await self.session.execute(
+                insert(ShipmentEvent), [event.model_dump() for event in events]
+            )
+            await self.event_service._change_partner_load(partner.id, load_change)
+            await self.event_service._notify_batch(notifications)
+            versions = await self.event_service._bump_versions(
+                {event.shipment_id for event in events}
+            )
+
+        if changed:
+            await self.session.execute(update(Shipment), changed)
+
+        await self.session.commit()
+        await self.event_service._publish(events)
+        await self.event_service._cache_versions(versions)
 
-        return await self._update(shipment)
+        return results
 
     async def rate(self, token: str, rating: int, comment: str | None):
         token_data = decode_url_safe_token(token)
@@ -98,9 +484,9 @@ class ShipmentService(BaseService):
         self.session.add(new_review)
         await self.session.commit()
 
-    async def cancel(self, id: UUID, seller: Seller) -> Shipment:
-        # Validate seller
-        shipment = await self.get(id)
+    async def cancel(self, id: UUID, seller: SellerPrincipal) -> Shipment:
+        # Validate seller, locked like update
+        shipment = await self.get(id, lock=True)
 
         if shipment is None:
             raise EntityNotFound
@@ -108,13 +494,12 @@ class ShipmentService(BaseService):
         if shipment.seller_id != seller.id:
             raise ClientNotAuthorized
 
-        event = await self.event_service.add(
-            shipment=shipment, status=ShipmentStatus.cancelled
-        )
+        if shipment.current_status in INACTIVE_SHIPMENT_STATUSES:
+            raise ShipmentClosed
 
-        shipment.timeline.append(event)
+        await self.event_service.add(shipment=shipment, status=ShipmentStatus.cancelled)
 
-        return shipment
+        return await self.get(id, *SHIPMENT_READ_OPTIONS)
 
     async def delete(self, id: UUID) -> None:
         shipment = await self.get(id)
@@ -122,23 +507,42 @@ class ShipmentService(BaseService):
             await self._delete(shipment)
 
     async def add_tag(self, id: UUID, tag_name: TagName):
-        shipment = await self.get(id)
-        if shipment is None:
+        tag_id = await tag_registry.id(self.session, tag_name)
+
+        try:
+            result = await self.session.execute(
+                postgresql.insert(ShipmentTag)
+                .values(shipment_id=id, tag_id=tag_id)
+                .on_conflict_do_nothing()
+            )
+            # Unchanged if already tagged
+            versions = (
+                await self.event_service._bump_versions([id]) if result.rowcount else {}
+            )
+            await self.session.commit()
+        except IntegrityError:
+            # No shipment with the id
+            await self.session.rollback()
             raise EntityNotFound
 
-        shipment.tags.append(await tag_name.tag(self.session))
+        await self.event_service._cache_versions(versions)
 
-        return await self._update(shipment)
+        return await self.get(id, *SHIPMENT_READ_OPTIONS)
 
     async def remove_tag(self, id: UUID, tag_name: TagName):
-        shipment = await self.get(id)
+        tag_id = await tag_registry.id(self.session, tag_name)
 
-        if shipment is None:
-            raise EntityNotFound
+        result = await self.session.execute(
+            delete(ShipmentTag).where(
+                ShipmentTag.shipment_id == id, ShipmentTag.tag_id == tag_id
+            )
+        )
 
-        try:
-            shipment.tags.remove(await tag_name.tag(self.session))
-        except ValueError:
+        if result.rowcount == 0:
             raise EntityNotFound
 
-        return await self._update(shipment)
+        versions = await self.event_service._bump_versions([id])
+        await self.session.commit()
+        await self.event_service._cache_versions(versions)
+
+        return await self.get(id, *SHIPMENT_READ_OPTIONS)
@@ -1,6 +1,22 @@
+from contextlib import suppress
+from datetime import datetime
+from typing import Iterable
+from uuid import UUID
+
+from redis.exceptions import RedisError
+from sqlalchemy import update
+
 from app.config import app_settings
-from app.database.models import Shipment, ShipmentEvent, ShipmentStatus
+from app.database.models import (
+    INACTIVE_SHIPMENT_STATUSES,
+    DeliveryPartner,
+    Shipment,
+    ShipmentEvent,
+    ShipmentStatus,
+)
+from app.database.redis import cache_shipment_versions, publish_tracking_events
 from app.services.base import BaseService
+from app.services.outbox import OutboxService
 from app.utils import generate_url_safe_token
 from app.worker.tasks import send_email_with_template
 
@@ -8,6 +24,7 @@ from app.worker.tasks import send_email_with_template
 class ShipmentEventService(BaseService):
     def __init__(self, session):
         super().__init__(ShipmentEvent, session)
+        self.outbox_service = OutboxService(session)
 
     async def add(
         self,
@@ -15,12 +32,13 @@ class ShipmentEventService(BaseService):
         location: int | None = None,
         status: ShipmentStatus | None = None,
         description: str | None = None,
+        seller_name: str | None = None,
+        partner_name: str | None = None,
     ):
-        if not location or not status:
-            last_event = await self.get_latest_event(shipment)
+        previous_status = shipment.current_status
 
-            location = location if location else last_event.location
-            status = status if status else last_event.status
+        location = location if location else shipment.current_location
+        status = status if status else shipment.current_status
 
         new_event = ShipmentEvent(
             location=location,
@@ -33,14 +51,53 @@ class ShipmentEventService(BaseService):
             shipment_id=shipment.id,
         )
 
-        await self._notify(shipment, status)
+        shipment.current_status = status
+        shipment.current_location = location
+
+        await self._update_partner_load(shipment, previous_status, status)
+        versions = await self._bump_versions([shipment.id])
+
+        await self._notify(
+            shipment, status, seller_name=seller_name, partner_name=partner_name
+        )
 
-        return await self._add(new_event)
+        new_event = await self._add(new_event)
+        await self._publish([new_event])
+        await self._cache_versions(versions)
 
-    async def get_latest_event(self, shipment: Shipment):
-        timeline = shipment.timeline
-        timeline.sort(key=lambda item: item.created_at)
-        return timeline[-1]
+        return new_event
+
+    async def _update_partner_load(
+        self,
+        shipment: Shipment,
+        previous_status: ShipmentStatus | None,
+        status: ShipmentStatus,
+    ):
+        await self._change_partner_load(
+            shipment.delivery_partner_id, self._load_change(previous_status, status)
+        )
+
+    async def _change_partner_load(self, partner_id: UUID, change: int):
+        if not change:
+            return
+
+        await self.session.execute(
+            update(DeliveryPartner)
+            .where(DeliveryPartner.id == partner_id)
+            .values(
+                active_shipment_count=DeliveryPartner.active_shipment_count + change
+            )
+        )
+
+    @staticmethod
+    def _load_change(
+        previous_status: ShipmentStatus | None, status: ShipmentStatus
+    ) -> int:
+        # Shipments count as active from assignment until delivered or cancelled
+        was_active = previous_status not in INACTIVE_SHIPMENT_STATUSES
+        is_active = status not in INACTIVE_SHIPMENT_STATUSES
+
+        return int(is_active) - int(was_active)
 
     def _generate_description(self, status: ShipmentStatus, location: int):
         match status:
@@ -61,10 +118,64 @@ class ShipmentEventService(BaseService):
             case _:
                 return f"scanned at {location}"
 
-    async def _notify(self, shipment: Shipment, status: ShipmentStatus):
-        if status == ShipmentStatus.in_transit:
-            return
+    async def _publish(self, events: list[ShipmentEvent]):
+        # Only once committed. Live tracking is best effort,
+        # the tracking page shows any missed event on reload.
+        if events:
+            with suppress(RedisError):
+                await publish_tracking_events(
+                    [event.model_dump(mode="json") for event in events]
+                )
+
+    async def _bump_versions(self, shipment_ids: Iterable[UUID]) -> dict[UUID, int]:
+        # Counted up in the database, so concurrent changes get distinct versions
+        rows = await self.session.execute(
+            update(Shipment)
+            .where(Shipment.id.in_(list(shipment_ids)))
+            .values(version=Shipment.version + 1, updated_at=datetime.now())
+            .returning(Shipment.id, Shipment.version)
+        )
+
+        return dict(rows.tuples().all())
+
+    async def _cache_versions(self, versions: dict[UUID, int]):
+        # Only once committed. Should redis fail, reads go by the previously
+        # cached version until it expires.
+        if versions:
+            with suppress(RedisError):
+                await cache_shipment_versions(versions)
+
+    async def _notify(
+        self,
+        shipment: Shipment,
+        status: ShipmentStatus,
+        seller_name: str | None = None,
+        partner_name: str | None = None,
+    ):
+        notification = self._notification(
+            shipment, status, seller_name=seller_name, partner_name=partner_name
+        )
+
+        # Sent only once the event commits
+        if notification:
+            self.outbox_service.add(send_email_with_template.name, notification)
+
+    async def _notify_batch(self, notifications: list[dict]):
+        await self.outbox_service.add_many(
+            [
+                (send_email_with_template.name, notification)
+                for notification in notifications
+                if notification
+            ]
+        )
 
+    def _notification(
+        self,
+        shipment: Shipment,
+        status: ShipmentStatus,
+        seller_name: str | None = None,
+        partner_name: str | None = None,
+    ) -> dict | None:
         subject: str
         context = {}
         template_name: str
@@ -73,8 +184,8 @@ class ShipmentEventService(BaseService):
             case ShipmentStatus.placed:
                 subject = "Your Order is Shipped 🚛"
                 context["id"] = str(shipment.id)
-                context["seller"] = shipment.seller.name
-                context["partner"] = shipment.delivery_partner.name
+                context["seller"] = seller_name or shipment.seller.name
+                context["partner"] = partner_name or shipment.delivery_partner.name
                 template_name = "mail_placed.html"
 
             case ShipmentStatus.out_for_delivery:
@@ -83,7 +194,7 @@ class ShipmentEventService(BaseService):
 
             case ShipmentStatus.delivered:
                 subject = "Your Order is Delivered ✅"
-                context["seller"] = shipment.seller.name
+                context["seller"] = seller_name or shipment.seller.name
                 token = generate_url_safe_token({"id": str(shipment.id)})
                 context["review_url"] = (
                     f"http://{app_settings.APP_DOMAIN}/shipment/review?token={token}"
@@ -95,9 +206,12 @@ class ShipmentEventService(BaseService):
                 subject = "Your Order is Cancelled ❌"
                 template_name = "mail_cancelled.html"
 
-        send_email_with_template(
-            recipients=[shipment.client_contact_email],
-            subject=subject,
-            context=context,
-            template_name=template_name,
-        )
+            case _:
+                return None
+
+        return {
+            "recipients": [shipment.client_contact_email],
+            "subject": subject,
+            "context": context,
+            "template_name": template_name,
+        }
@@ -4,10 +4,12 @@ from fastapi import BackgroundTasks, HTTPException, status
 from pydantic import EmailStr
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
-from passlib.context import CryptContext
 from app.core.exceptions import ClientNotVerified, EntityNotFound, InvalidToken
+from app.core.security import password_hasher
 from app.database.models import User
+from app.database.principal import principal_cache
 from app.services.base import BaseService
+from app.services.notification import NotificationService
 from app.utils import (
     decode_url_safe_token,
     generate_access_token,
@@ -15,23 +17,23 @@ from app.utils import (
 )
 from app.config import app_settings
 from app.config import security_settings
-from app.worker.tasks import send_email_with_template
-
-password_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
 
 class UserService(BaseService):
     def __init__(self, model: User, session: AsyncSession):
         self.model = model
         self.session = session
+        self.notification_service = NotificationService()
 
     async def _add_user(self, data: dict, router_prefix: str) -> User:
-        user = self.model(**data, password_hash=password_context.hash(data["password"]))
+        user = self.model(
+            **data, password_hash=await password_hasher.hash(data["password"])
+        )
         user = await self._add(user)
 
-        token = generate_url_safe_token({"email": user.email, "id": user.id})
+        token = generate_url_safe_token({"email": user.email, "id": str(user.id)})
 
-        send_email_with_template(
+        await self.notification_service.send_email_with_template(
             recipients=[user.email],
             subject="Verify Your Account With FastShip",
             context={
@@ -52,6 +54,7 @@ class UserService(BaseService):
         user = await self._get(UUID(token_data["id"]))
         user.email_verified = True
         await self._update(user)
+        await principal_cache.invalidate(self.model, user.id)
 
     async def _get_by_email(self, email: str) -> User | None:
         return await self.session.scalar(
@@ -62,7 +65,9 @@ class UserService(BaseService):
         # Validate the credentials
         user = await self._get_by_email(email)
 
-        if user is None or not password_context.verify(password, user.password_hash):
+        if user is None or not await password_hasher.verify(
+            password, user.password_hash
+        ):
             raise EntityNotFound
 
         if not user.email_verified:
@@ -82,7 +87,7 @@ class UserService(BaseService):
             {"id": str(user.id)}, salt=security_settings.SECURITY_SALT
         )
 
-        send_email_with_template(
+        await self.notification_service.send_email_with_template(
             recipients=[user.email],
             subject="FastShip Account Password Reset",
             context={
@@ -101,8 +106,9 @@ class UserService(BaseService):
             return False
 
         user = await self._get(UUID(token_data["id"]))
-        user.password_hash = password_context.hash(password)
+        user.password_hash = await password_hasher.hash(password)
 
         await self._update(user)
+        await principal_cache.invalidate(self.model, user.id)
 
         return True
@@ -1,17 +1,41 @@
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from binascii import Error as Base64Error
 from datetime import datetime, timedelta, timezone
+from hashlib import sha256
 from pathlib import Path
+from time import time
 from uuid import uuid4
 
 from itsdangerous import URLSafeTimedSerializer, BadSignature, SignatureExpired
 
 from fastapi import HTTPException, status
 import jwt
+from prometheus_client import Counter
 
 from app.config import security_settings
+from app.core.cache import TTLCache
 from app.core.exceptions import ClientNotAuthorized
 
 _serializer = URLSafeTimedSerializer(security_settings.JWT_SECRET)
 
+# Verified claims by token digest, and the digest by jti to drop revoked tokens
+_access_token_claims = TTLCache(
+    max_size=security_settings.ACCESS_TOKEN_CACHE_SIZE, ttl=0
+)
+_access_token_digests = TTLCache(
+    max_size=security_settings.ACCESS_TOKEN_CACHE_SIZE, ttl=0
+)
+
+ACCESS_TOKEN_CACHE_HITS = Counter(
+    "access_token_cache_hits_total",
+    "Access tokens whose claims were served from the cache",
+)
+ACCESS_TOKEN_CACHE_MISSES = Counter(
+    "access_token_cache_misses_total",
+    "Access tokens whose signature had to be verified",
+)
+
 APP_DIR = Path(__file__).resolve().parent
 TEMPLATE_DIR = APP_DIR / "templates"
 
@@ -32,8 +56,17 @@ def generate_access_token(
 
 
 def decode_access_token(token: str) -> dict | None:
+    digest = sha256(token.encode()).digest()
+
+    claims = _access_token_claims.get(digest)
+    if claims is not None:
+        ACCESS_TOKEN_CACHE_HITS.inc()
+        return claims
+
+    ACCESS_TOKEN_CACHE_MISSES.inc()
+
     try:
-        return jwt.decode(
+        claims = jwt.decode(
             jwt=token,
             key=security_settings.JWT_SECRET,
             algorithms=[security_settings.JWT_ALGORITHM],
@@ -43,6 +76,35 @@ def decode_access_token(token: str) -> dict | None:
     except jwt.PyJWTError:
         return None
 
+    # Serve the claims until the token expires, then verify again to reject it
+    ttl = claims["exp"] - time()
+    if ttl > 0:
+        _access_token_claims.set(digest, claims, ttl=ttl)
+        _access_token_digests.set(claims["jti"], digest, ttl=ttl)
+
+    return claims
+
+
+def forget_access_token(jti: str):
+    digest = _access_token_digests.get(jti)
+
+    if digest is not None:
+        _access_token_claims.pop(digest)
+        _access_token_digests.pop(jti)
+
+
+def encode_cursor(data: dict) -> str:
+    return urlsafe_b64encode(json.dumps(data, default=str).encode()).decode()
+
+
+def decode_cursor(cursor: str) -> dict | None:
+    try:
+        data = json.loads(urlsafe_b64decode(cursor.encode()))
+    except (Base64Error, ValueError):
+        return None
+
+    return data if isinstance(data, dict) else None
+
 
 def generate_url_safe_token(data: dict, salt: str | None = None) -> str:
     return _serializer.dumps(data, salt=salt)
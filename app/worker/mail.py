@@ -0,0 +1,170 @@
+import asyncio
+import os
+from email.message import EmailMessage
+from email.utils import formataddr
+from threading import Lock, Thread
+from typing import Awaitable, Coroutine
+
+from aiosmtplib import SMTP, SMTPServerDisconnected
+
+from app.config import notification_settings
+from app.core.templates import render_template
+
+
+class _Connection:
+    def __init__(self, smtp: SMTP):
+        self.smtp = smtp
+        self.sent = 0
+
+
+class SMTPPool:
+    """Authenticated SMTP connections, each reused for many messages.
+
+    A connection is replaced once the server drops it or it has sent
+    max_messages, so long lived workers do not hit server side limits.
+    """
+
+    def __init__(self, size: int, max_messages: int):
+        self.max_messages = max_messages
+        # Every slot holds an open connection, or None until one is needed
+        self._slots: asyncio.Queue[_Connection | None] = asyncio.Queue()
+        for _ in range(size):
+            self._slots.put_nowait(None)
+
+    async def send(self, message: EmailMessage):
+        connection = await self._slots.get()
+
+        try:
+            # Servers close idle connections, retry once on a fresh one
+            for retry in (True, False):
+                if not self._usable(connection):
+                    await self._close(connection)
+                    connection = await self._connect()
+
+                try:
+                    await connection.smtp.send_message(message)
+                except SMTPServerDisconnected:
+                    connection = None
+                    if not retry:
+                        raise
+                else:
+                    connection.sent += 1
+                    return
+        finally:
+            self._slots.put_nowait(connection)
+
+    def _usable(self, connection: _Connection | None) -> bool:
+        return (
+            connection is not None
+            and connection.smtp.is_connected
+            and connection.sent < self.max_messages
+        )
+
+    async def _connect(self) -> _Connection:
+        smtp = SMTP(
+            hostname=notification_settings.MAIL_SERVER,
+            port=notification_settings.MAIL_PORT,
+            username=(
+                notification_settings.MAIL_USERNAME
+                if notification_settings.USE_CREDENTIALS
+                else None
+            ),
+            password=(
+                notification_settings.MAIL_PASSWORD
+                if notification_settings.USE_CREDENTIALS
+                else None
+            ),
+            use_tls=notification_settings.MAIL_SSL_TLS,
+            start_tls=notification_settings.MAIL_STARTTLS,
+            validate_certs=notification_settings.VALIDATE_CERTS,
+            timeout=notification_settings.MAIL_TIMEOUT,
+        )
+        await smtp.connect()
+
+        return _Connection(smtp)
+
+    async def _close(self, connection: _Connection | None):
+        if connection is not None and connection.smtp.is_connected:
+            try:
+                await connection.smtp.quit()
+            except Exception:
+                connection.smtp.close()
+
+
+class _Mailer:
+    """Runs the SMTP pool on an event loop thread that outlives single tasks.
+
+    Celery forks its workers, so each process starts its own loop and pool
+    on first use.
+    """
+
+    def __init__(self):
+        self._lock = Lock()
+        self._pid: int | None = None
+
+    def _start(self):
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+
+            self._loop = asyncio.new_event_loop()
+            Thread(target=self._loop.run_forever, name="smtp", daemon=True).start()
+
+            self._pool = SMTPPool(
+                size=notification_settings.MAIL_POOL_SIZE,
+                max_messages=notification_settings.MAIL_MAX_MESSAGES_PER_CONNECTION,
+            )
+            self._pid = os.getpid()
+
+    def _run(self, coroutine: Coroutine):
+        if self._pid != os.getpid():
+            self._start()
+
+        return asyncio.run_coroutine_threadsafe(coroutine, self._loop).result()
+
+    async def _build_and_send(self, message: Awaitable[EmailMessage]):
+        await self._pool.send(await message)
+
+    def send(self, message: Awaitable[EmailMessage]):
+        self._run(self._build_and_send(message))
+
+    def send_many(
+        self, messages: list[Awaitable[EmailMessage]]
+    ) -> list[BaseException | None]:
+        """Send over all pooled connections at once, returns each message's error"""
+
+        async def send_all():
+            return await asyncio.gather(
+                *(self._build_and_send(message) for message in messages),
+                return_exceptions=True,
+            )
+
+        return self._run(send_all())
+
+
+mailer = _Mailer()
+
+
+async def build_message(
+    recipients: list[str], subject: str, body: str, subtype: str = "plain"
+) -> EmailMessage:
+    message = EmailMessage()
+    message["From"] = formataddr(
+        (notification_settings.MAIL_FROM_NAME, notification_settings.MAIL_FROM)
+    )
+    message["To"] = ", ".join(recipients)
+    message["Subject"] = subject
+    message.set_content(body, subtype=subtype)
+
+    return message
+
+
+async def build_template_message(
+    recipients: list[str], subject: str, context: dict, template_name: str
+) -> EmailMessage:
+    return await build_message(
+        recipients,
+        subject,
+        await render_template(template_name, context),
+        subtype="html",
+    )
@@ -1,47 +1,50 @@
-from asgiref.sync import async_to_sync
+from aiosmtplib import SMTPException
 from celery import Celery
-from fastapi_mail import ConnectionConfig, FastMail, MessageSchema, MessageType
+from celery.signals import worker_init
 
-from app.config import db_settings, notification_settings
-from app.utils import TEMPLATE_DIR
-
-fast_mail = FastMail(
-    ConnectionConfig(
-        **notification_settings.model_dump(),
-        TEMPLATE_FOLDER=TEMPLATE_DIR,
-    )
-)
+from app.config import db_settings
+from app.core.templates import preload_templates
+from app.worker.mail import build_message, build_template_message, mailer
 
+app = Celery("api_tasks", broker=db_settings.REDIS_URL(db_settings.REDIS_BROKER_DB))
 
-send_message = async_to_sync(fast_mail.send_message)
 
-app = Celery("api_tasks", broker=db_settings.REDIS_URL(9))
+# Compile templates once, before the pool processes are forked
+@worker_init.connect
+def load_templates(**kwargs):
+    preload_templates()
 
 
-@app.task
+@app.task(autoretry_for=(SMTPException,), retry_backoff=True, max_retries=5)
 def send_mail(recipients: list[str], subject: str, body: str):
-    send_message(
-        MessageSchema(
-            recipients=recipients, subject=subject, body=body, subtype=MessageType.plain
-        )
-    )
+    mailer.send(build_message(recipients, subject, body))
 
     return "Message Sent!"
 
 
-@app.task
+@app.task(autoretry_for=(SMTPException,), retry_backoff=True, max_retries=5)
 def send_email_with_template(
     recipients: list[str],
     subject: str,
     context: dict,
     template_name: str,
 ):
-    send_message(
-        message=MessageSchema(
-            recipients=recipients,
-            subject=subject,
-            template_body=context,
-            subtype=MessageType.html,
-        ),
-        template_name=template_name,
+    mailer.send(build_template_message(recipients, subject, context, template_name))
+
+
+@app.task
+def send_emails_with_template(notifications: list[dict]):
+    errors = mailer.send_many(
+        [build_template_message(**notification) for notification in notifications]
     )
+
+    # Retry failures one by one, so delivered messages are not sent again
+    failed = [
+        notification
+        for notification, error in zip(notifications, errors)
+        if error is not None
+    ]
+    for notification in failed:
+        send_email_with_template.delay(**notification)
+
+    return f"{len(notifications) - len(failed)} Messages Sent!"
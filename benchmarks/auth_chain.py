@@ -0,0 +1,102 @@
+"""Time per request of the seller auth dependency chain.
+
+Measures token decoding alone and the whole chain behind SellerDep, with the
+verified claims cache and with every token verified again as before it.
+The blacklist listener and principal cache run as in the api.
+
+    python -m benchmarks.auth_chain --iterations 10000
+"""
+
+import argparse
+import asyncio
+from time import perf_counter
+
+import jwt
+
+# Sets the environment before the app reads its settings
+from benchmarks.common import reset_database, use_fake_redis
+
+from app.api import dependencies
+from app.api.dependencies import get_current_seller, get_seller_access_token
+from app.config import security_settings
+from app.database.models import Seller
+from app.database.redis import _blacklist_listener, listen_for_blacklisted_jtis
+from app.database.session import async_session
+from app.utils import decode_access_token, generate_access_token
+
+
+def decode_uncached(token: str) -> dict | None:
+    """decode_access_token as it was, verifying the signature every time"""
+    try:
+        return jwt.decode(
+            jwt=token,
+            key=security_settings.JWT_SECRET,
+            algorithms=[security_settings.JWT_ALGORITHM],
+        )
+    except jwt.PyJWTError:
+        return None
+
+
+async def per_call(function, iterations: int, repeat: int = 5) -> float:
+    """Microseconds per awaited call, best of several runs like timeit"""
+    timings = []
+
+    for _ in range(repeat):
+        start = perf_counter()
+        for _ in range(iterations):
+            await function()
+        timings.append((perf_counter() - start) / iterations * 1_000_000)
+
+    return min(timings)
+
+
+async def main(iterations: int):
+    use_fake_redis()
+    await reset_database()
+
+    async with async_session() as session:
+        seller = Seller(name="seller", email="seller@example.com", password_hash="-")
+        session.add(seller)
+        await session.commit()
+
+    token = generate_access_token({"user": {"name": seller.name, "id": str(seller.id)}})
+
+    listener = asyncio.create_task(listen_for_blacklisted_jtis())
+    while not _blacklist_listener.subscribed:
+        await asyncio.sleep(0.01)
+
+    async with async_session() as session:
+
+        async def decode():
+            dependencies.decode_access_token(token)
+
+        async def chain():
+            await get_current_seller(await get_seller_access_token(token), session)
+
+        # Warm the principal and blacklist caches
+        await chain()
+
+        results = {}
+        for label, decoder in (
+            ("before", decode_uncached),
+            ("after", decode_access_token),
+        ):
+            dependencies.decode_access_token = decoder
+            results[label] = (
+                await per_call(decode, iterations),
+                await per_call(chain, iterations),
+            )
+
+    listener.cancel()
+
+    print(f"{'':<8}{'decode':>12}{'auth chain':>14}")
+    for label, (decode_time, chain_time) in results.items():
+        print(f"{label:<8}{decode_time:>9.1f} us{chain_time:>11.1f} us")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=10000)
+    args = parser.parse_args()
+
+    asyncio.run(main(args.iterations))
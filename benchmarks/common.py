@@ -0,0 +1,72 @@
+"""Shared setup of the benchmarks: the test database and an in-memory redis.
+
+Run them from the repository root, e.g. python -m benchmarks.login_latency
+"""
+
+import os
+from statistics import quantiles
+
+# Settings are read on import, point them at local services unless set
+for name, value in {
+    "POSTGRES_SERVER": "localhost",
+    "POSTGRES_PORT": "5432",
+    "POSTGRES_USER": "postgres",
+    "POSTGRES_PASSWORD": "postgres",
+    "POSTGRES_DB": "fastship_test",
+    "REDIS_HOST": "localhost",
+    "REDIS_PORT": "6379",
+    "JWT_SECRET": "benchmark-secret",
+    "JWT_ALGORITHM": "HS256",
+    "SECURITY_SALT": "benchmark-salt",
+    "MAIL_USERNAME": "fastship",
+    "MAIL_PASSWORD": "fastship",
+    "MAIL_SERVER": "127.0.0.1",
+    "MAIL_PORT": "8025",
+    "MAIL_STARTTLS": "false",
+    "USE_CREDENTIALS": "false",
+    "MAIL_FROM": "noreply@example.com",
+    "MAIL_FROM_NAME": "FastShip",
+    # Benchmarks hammer single routes from one address
+    "LOGIN_RATE_LIMIT_PER_IP": "1000000",
+    "LOGIN_RATE_LIMIT_PER_EMAIL": "1000000",
+    "SIGNUP_RATE_LIMIT_PER_IP": "1000000",
+}.items():
+    os.environ.setdefault(name, value)
+
+import fakeredis
+from sqlalchemy import text
+
+from app.config import db_settings
+from app.database.partitions import shipment_event_partitions
+from app.database.redis import redis_clients
+from app.database.session import create_db_tables, engine
+
+
+def use_fake_redis():
+    server = fakeredis.FakeServer()
+    clients = {}
+
+    redis_clients.get = lambda db: clients.setdefault(
+        db, fakeredis.FakeAsyncRedis(server=server, db=db)
+    )
+
+
+async def reset_database():
+    if not db_settings.POSTGRES_DB.endswith("_test"):
+        raise SystemExit(
+            "POSTGRES_DB must name a test database, its tables are dropped"
+        )
+
+    async with engine.begin() as connection:
+        await connection.execute(text("DROP SCHEMA public CASCADE"))
+        await connection.execute(text("CREATE SCHEMA public"))
+
+    await create_db_tables()
+    async with engine.begin() as connection:
+        await shipment_event_partitions.create(connection)
+
+
+def percentiles(samples: list[float]) -> str:
+    """p50 and p99 of latencies in seconds, as milliseconds"""
+    cuts = quantiles(samples, n=100)
+    return f"p50 {cuts[49] * 1000:8.1f} ms   p99 {cuts[98] * 1000:8.1f} ms"
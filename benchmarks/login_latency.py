@@ -0,0 +1,134 @@
+"""Latency of shipment tracking while sellers log in concurrently.
+
+Tracking is measured alone, next to a login storm with bcrypt on the
+password hash pool, and next to the same storm with bcrypt run on the event
+loop as it was before the pool.
+
+    python -m benchmarks.login_latency --logins 16 --requests 300
+"""
+
+import argparse
+import asyncio
+from datetime import datetime, timedelta
+from time import perf_counter
+
+from httpx import ASGITransport, AsyncClient
+
+# Sets the environment before the app reads its settings
+from benchmarks.common import percentiles, reset_database, use_fake_redis
+
+from app.core.security import password_hasher
+from app.database.models import DeliveryPartner, Seller, Shipment, ShipmentStatus
+from app.database.session import async_session
+from app.main import app
+
+EMAIL = "seller@example.com"
+PASSWORD = "benchmark-password"
+
+
+async def seed() -> str:
+    """A seller to log in as, and a shipment to track"""
+    async with async_session() as session:
+        partner = DeliveryPartner(
+            name="DHL",
+            email="dhl@example.com",
+            password_hash="-",
+            serviceable_zip_codes=[11001],
+            max_handling_capacity=10,
+        )
+        seller = Seller(
+            name="seller",
+            email=EMAIL,
+            password_hash=await password_hasher.hash(PASSWORD),
+            email_verified=True,
+        )
+        session.add_all([partner, seller])
+        await session.flush()
+
+        shipment = Shipment(
+            content="books",
+            weight=2,
+            destination=11001,
+            client_contact_email="client@example.com",
+            client_contact_phone=None,
+            estimated_delivery=datetime.now() + timedelta(days=3),
+            current_status=ShipmentStatus.placed,
+            current_location=11001,
+            seller_id=seller.id,
+            delivery_partner_id=partner.id,
+        )
+        session.add(shipment)
+        await session.commit()
+
+        return str(shipment.id)
+
+
+async def track(client: AsyncClient, shipment_id: str, requests: int) -> list[float]:
+    latencies = []
+
+    for _ in range(requests):
+        start = perf_counter()
+        response = await client.get("/shipment/track", params={"id": shipment_id})
+        latencies.append(perf_counter() - start)
+        response.raise_for_status()
+
+    return latencies
+
+
+async def log_in(client: AsyncClient, stop: asyncio.Event):
+    while not stop.is_set():
+        response = await client.post(
+            "/seller/token", data={"username": EMAIL, "password": PASSWORD}
+        )
+        response.raise_for_status()
+
+
+async def measure(
+    client: AsyncClient, shipment_id: str, logins: int, requests: int
+) -> list[float]:
+    stop = asyncio.Event()
+    storm = [asyncio.create_task(log_in(client, stop)) for _ in range(logins)]
+
+    try:
+        # Let the logins queue up first
+        await asyncio.sleep(0.5 if logins else 0)
+        return await track(client, shipment_id, requests)
+    finally:
+        stop.set()
+        await asyncio.gather(*storm)
+
+
+async def main(logins: int, requests: int):
+    use_fake_redis()
+    await reset_database()
+    shipment_id = await seed()
+
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url="http://benchmark"
+    ) as client:
+        # Warm the tracking cache
+        await track(client, shipment_id, 10)
+
+        # How login ran before, bcrypt straight on the event loop
+        async def run_inline(function, *args):
+            return function(*args)
+
+        for label, concurrent_logins in (
+            ("alone", 0),
+            (f"next to {logins} logins, bcrypt on the pool", logins),
+            (f"next to {logins} logins, bcrypt on the loop", logins),
+        ):
+            if label.endswith("loop"):
+                password_hasher._run = run_inline
+
+            latencies = await measure(client, shipment_id, concurrent_logins, requests)
+            print(f"tracking {label:<42} {percentiles(latencies)}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--logins", type=int, default=16, help="concurrent logins")
+    parser.add_argument("--requests", type=int, default=300, help="tracking requests")
+    args = parser.parse_args()
+
+    asyncio.run(main(args.logins, args.requests))
@@ -0,0 +1,114 @@
+"""Messages per second the worker mailer sends to a local smtp server.
+
+Compares pooled connections reused for many messages against a new
+connection per message, as every email was sent before. The server delays
+each handshake, like TLS and login against a remote server, and can drop
+connections every few messages.
+
+    python -m benchmarks.smtp_throughput --messages 500 --drop-every 30
+"""
+
+import argparse
+import asyncio
+from time import perf_counter
+
+from aiosmtpd.controller import Controller
+
+# Sets the environment before the app reads its settings
+import benchmarks.common  # noqa: F401
+
+from app.config import notification_settings
+from app.worker import mail
+from app.worker.mail import build_template_message
+
+
+class StandInServer:
+    def __init__(self, handshake_latency: float, drop_every: int | None):
+        self.handshake_latency = handshake_latency
+        self.drop_every = drop_every
+        self.connections = 0
+        self.received = 0
+
+    async def handle_EHLO(self, server, session, envelope, hostname, responses):
+        await asyncio.sleep(self.handshake_latency)
+        self.connections += 1
+        session.host_name = hostname
+        session.received = 0
+        return responses
+
+    async def handle_DATA(self, server, session, envelope):
+        self.received += 1
+        session.received += 1
+
+        if self.drop_every and session.received % self.drop_every == 0:
+            # Hang up once the reply is written, as servers with limits do
+            asyncio.get_running_loop().call_soon(server.transport.close)
+
+        return "250 Message accepted for delivery"
+
+
+def send(count: int, max_messages: int) -> tuple[float, int]:
+    """Seconds to send count messages, and how many of them failed"""
+    notification_settings.MAIL_MAX_MESSAGES_PER_CONNECTION = max_messages
+    mailer = mail._Mailer()
+
+    start = perf_counter()
+    errors = mailer.send_many(
+        [
+            build_template_message(
+                recipients=[f"client{number}@example.com"],
+                subject="Your Order is Shipped",
+                context={"seller": "seller", "partner": "DHL"},
+                template_name="mail_placed.html",
+            )
+            for number in range(count)
+        ]
+    )
+
+    return perf_counter() - start, sum(error is not None for error in errors)
+
+
+def main(count: int, handshake_latency: float, drop_every: int | None):
+    server = StandInServer(handshake_latency, drop_every)
+    controller = Controller(
+        server,
+        hostname=notification_settings.MAIL_SERVER,
+        port=notification_settings.MAIL_PORT,
+    )
+    controller.start()
+
+    results = {}
+    for label, max_messages in (
+        ("before", 1),
+        ("after", notification_settings.MAIL_MAX_MESSAGES_PER_CONNECTION),
+    ):
+        server.connections = server.received = 0
+        elapsed, failed = send(count, max_messages)
+        results[label] = (count / elapsed, server.connections, failed)
+
+    controller.stop()
+
+    print(f"pool size {notification_settings.MAIL_POOL_SIZE}, {count} messages")
+    print(f"{'':<8}{'messages/s':>12}{'connections':>13}{'failed':>8}")
+    for label, (rate, connections, failed) in results.items():
+        print(f"{label:<8}{rate:>12.1f}{connections:>13}{failed:>8}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=500)
+    parser.add_argument(
+        "--handshake-latency",
+        type=float,
+        default=0.05,
+        help="seconds the server takes to greet each new connection",
+    )
+    parser.add_argument(
+        "--drop-every",
+        type=int,
+        default=None,
+        help="close each connection after this many messages",
+    )
+    args = parser.parse_args()
+
+    main(args.messages, args.handshake_latency, args.drop_every)
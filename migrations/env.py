@@ -9,6 +9,7 @@ from alembic import context
 from sqlmodel import SQLModel
 
 from app.config import db_settings
+from app.database.partitions import shipment_event_partitions
 
 
 # this is the Alembic Config object, which provides
@@ -28,6 +29,16 @@ from app.database import models  # noqa: F401
 
 target_metadata = SQLModel.metadata
 
+
+def include_name(name, type_, parent_names) -> bool:
+    # Partitions are created and dropped at runtime, not by migrations.
+    # Skipping them skips their indexes too.
+    if type_ == "table":
+        return not shipment_event_partitions.is_partition(name)
+
+    return True
+
+
 # other values from the config, defined by the needs of env.py,
 # can be acquired:
 # my_important_option = config.get_main_option("my_important_option")
@@ -50,6 +61,7 @@ def run_migrations_offline() -> None:
     context.configure(
         url=url,
         target_metadata=target_metadata,
+        include_name=include_name,
         literal_binds=True,
         dialect_opts={"paramstyle": "named"},
     )
@@ -59,7 +71,11 @@ def run_migrations_offline() -> None:
 
 
 def do_run_migrations(connection: Connection) -> None:
-    context.configure(connection=connection, target_metadata=target_metadata)
+    context.configure(
+        connection=connection,
+        target_metadata=target_metadata,
+        include_name=include_name,
+    )
 
     with context.begin_transaction():
         context.run_migrations()
@@ -0,0 +1,34 @@
+"""add shipment tag tag id index
+
+Revision ID: 0b6d2e8f4a71
+Revises: f3a9c06e1d25
+Create Date: 2026-10-17 15:20:44.690127
+
+"""
+from typing import Sequence, Union
+
+import sqlmodel
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0b6d2e8f4a71'
+down_revision: Union[str, Sequence[str], None] = 'f3a9c06e1d25'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index(
+        "ix_shipment_tag_tag_id_shipment_id",
+        "shipment_tag",
+        ["tag_id", "shipment_id"],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_shipment_tag_tag_id_shipment_id", table_name="shipment_tag")
@@ -0,0 +1,41 @@
+"""add outbox
+
+Revision ID: 1d4f7b92e6c3
+Revises: 0b6d2e8f4a71
+Create Date: 2026-10-17 16:05:12.318402
+
+"""
+from typing import Sequence, Union
+
+import sqlmodel
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '1d4f7b92e6c3'
+down_revision: Union[str, Sequence[str], None] = '0b6d2e8f4a71'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "outbox",
+        sa.Column("id", sa.UUID(), nullable=False),
+        sa.Column("created_at", postgresql.TIMESTAMP(), nullable=True),
+        sa.Column("task", sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+        sa.Column("payload", postgresql.JSONB(astext_type=sa.Text()), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(
+        op.f("ix_outbox_created_at"), "outbox", ["created_at"], unique=False
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f("ix_outbox_created_at"), table_name="outbox")
+    op.drop_table("outbox")
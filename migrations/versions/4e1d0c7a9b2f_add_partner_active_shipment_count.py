@@ -0,0 +1,51 @@
+"""add partner active shipment count
+
+Revision ID: 4e1d0c7a9b2f
+Revises: 3469ce7f5925
+Create Date: 2026-10-17 09:12:40.118204
+
+"""
+from typing import Sequence, Union
+
+import sqlmodel
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4e1d0c7a9b2f'
+down_revision: Union[str, Sequence[str], None] = '3469ce7f5925'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column(
+        "delivery_partner",
+        sa.Column(
+            "active_shipment_count", sa.Integer(), server_default="0", nullable=False
+        ),
+    )
+    # Backfill from the latest event of each assigned shipment
+    op.execute(
+        sa.text(
+            """
+            UPDATE delivery_partner SET active_shipment_count = (
+                SELECT count(*) FROM shipment
+                WHERE shipment.delivery_partner_id = delivery_partner.id
+                AND coalesce((
+                    SELECT shipment_event.status::text FROM shipment_event
+                    WHERE shipment_event.shipment_id = shipment.id
+                    ORDER BY shipment_event.created_at DESC
+                    LIMIT 1
+                ), 'placed') NOT IN ('delivered', 'cancelled')
+            )
+            """
+        )
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column("delivery_partner", "active_shipment_count")
@@ -0,0 +1,36 @@
+"""add shipment event shipment id created at index
+
+Revision ID: 5a8c3e1f9b47
+Revises: 1d4f7b92e6c3
+Create Date: 2026-10-17 16:48:31.502716
+
+"""
+from typing import Sequence, Union
+
+import sqlmodel
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5a8c3e1f9b47'
+down_revision: Union[str, Sequence[str], None] = '1d4f7b92e6c3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index(
+        "ix_shipment_event_shipment_id_created_at",
+        "shipment_event",
+        ["shipment_id", "created_at"],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(
+        "ix_shipment_event_shipment_id_created_at", table_name="shipment_event"
+    )
@@ -0,0 +1,53 @@
+"""add shipment version
+
+Revision ID: 7c4b1e9d2f58
+Revises: 9e2d6b4a7c18
+Create Date: 2026-10-17 18:02:47.530916
+
+"""
+from typing import Sequence, Union
+
+import sqlmodel
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7c4b1e9d2f58'
+down_revision: Union[str, Sequence[str], None] = '9e2d6b4a7c18'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column(
+        "shipment",
+        sa.Column("version", sa.Integer(), server_default="1", nullable=False),
+    )
+    op.add_column(
+        "shipment", sa.Column("updated_at", postgresql.TIMESTAMP(), nullable=True)
+    )
+    # Existing shipments last changed with their latest event
+    op.execute(
+        sa.text(
+            """
+            UPDATE shipment SET updated_at = coalesce(
+                (
+                    SELECT max(shipment_event.created_at) FROM shipment_event
+                    WHERE shipment_event.shipment_id = shipment.id
+                ),
+                shipment.created_at,
+                now()
+            )
+            """
+        )
+    )
+    op.alter_column("shipment", "updated_at", nullable=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column("shipment", "updated_at")
+    op.drop_column("shipment", "version")
@@ -0,0 +1,39 @@
+"""add partner zip code index
+
+Revision ID: 8a3f52c19d64
+Revises: 4e1d0c7a9b2f
+Create Date: 2026-10-17 10:03:18.552410
+
+"""
+from typing import Sequence, Union
+
+import sqlmodel
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8a3f52c19d64'
+down_revision: Union[str, Sequence[str], None] = '4e1d0c7a9b2f'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index(
+        "ix_delivery_partner_serviceable_zip_codes",
+        "delivery_partner",
+        ["serviceable_zip_codes"],
+        unique=False,
+        postgresql_using="gin",
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(
+        "ix_delivery_partner_serviceable_zip_codes",
+        table_name="delivery_partner",
+        postgresql_using="gin",
+    )
@@ -0,0 +1,142 @@
+"""partition shipment event by month
+
+Revision ID: 9e2d6b4a7c18
+Revises: 5a8c3e1f9b47
+Create Date: 2026-10-17 17:26:09.114583
+
+"""
+from typing import Sequence, Union
+
+import sqlmodel
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9e2d6b4a7c18'
+down_revision: Union[str, Sequence[str], None] = '5a8c3e1f9b47'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Move the plain table aside, names of constraints and indexes included
+    op.rename_table("shipment_event", "shipment_event_old")
+    op.execute(
+        "ALTER TABLE shipment_event_old "
+        "RENAME CONSTRAINT shipment_event_pkey TO shipment_event_old_pkey"
+    )
+    op.execute(
+        "ALTER TABLE shipment_event_old RENAME CONSTRAINT "
+        "shipment_event_shipment_id_fkey TO shipment_event_old_shipment_id_fkey"
+    )
+    op.execute(
+        "ALTER INDEX ix_shipment_event_shipment_id_created_at "
+        "RENAME TO ix_shipment_event_old_shipment_id_created_at"
+    )
+
+    # The partition key has to be part of the primary key
+    op.execute(
+        """
+        CREATE TABLE shipment_event (
+            id UUID NOT NULL,
+            created_at TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+            location INTEGER NOT NULL,
+            status shipmentstatus NOT NULL,
+            description VARCHAR,
+            shipment_id UUID NOT NULL,
+            PRIMARY KEY (id, created_at),
+            FOREIGN KEY (shipment_id) REFERENCES shipment (id)
+        ) PARTITION BY RANGE (created_at)
+        """
+    )
+    op.create_index(
+        "ix_shipment_event_shipment_id_created_at",
+        "shipment_event",
+        ["shipment_id", "created_at"],
+        unique=False,
+    )
+
+    # A partition per month from the oldest event to three months ahead,
+    # named like app.database.partitions names them
+    op.execute("CREATE TABLE shipment_event_default PARTITION OF shipment_event DEFAULT")
+    op.execute(
+        """
+        DO $$
+        DECLARE
+            month DATE := date_trunc(
+                'month', coalesce((SELECT min(created_at) FROM shipment_event_old), now())
+            );
+        BEGIN
+            WHILE month <= date_trunc('month', now()) + INTERVAL '3 months' LOOP
+                EXECUTE format(
+                    'CREATE TABLE %I PARTITION OF shipment_event FOR VALUES FROM (%L) TO (%L)',
+                    'shipment_event_y' || to_char(month, 'YYYY') || 'm' || to_char(month, 'MM'),
+                    month,
+                    (month + INTERVAL '1 month')::DATE
+                );
+                month := month + INTERVAL '1 month';
+            END LOOP;
+        END $$
+        """
+    )
+
+    op.execute(
+        """
+        INSERT INTO shipment_event
+        SELECT id, coalesce(created_at, now()), location, status, description, shipment_id
+        FROM shipment_event_old
+        """
+    )
+    op.drop_table("shipment_event_old")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # Events of archived partitions are not brought back
+    op.create_table(
+        "shipment_event_flat",
+        sa.Column("id", sa.UUID(), nullable=False),
+        sa.Column("created_at", postgresql.TIMESTAMP(), nullable=True),
+        sa.Column("location", sa.Integer(), nullable=False),
+        sa.Column(
+            "status",
+            postgresql.ENUM(name="shipmentstatus", create_type=False),
+            nullable=False,
+        ),
+        sa.Column("description", sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+        sa.Column("shipment_id", sa.Uuid(), nullable=False),
+        sa.ForeignKeyConstraint(
+            ["shipment_id"],
+            ["shipment.id"],
+            name="shipment_event_flat_shipment_id_fkey",
+        ),
+        sa.PrimaryKeyConstraint("id", name="shipment_event_flat_pkey"),
+    )
+    op.execute(
+        """
+        INSERT INTO shipment_event_flat
+        SELECT id, created_at, location, status, description, shipment_id
+        FROM shipment_event
+        """
+    )
+    # Drops every partition along with it
+    op.drop_table("shipment_event")
+
+    op.rename_table("shipment_event_flat", "shipment_event")
+    op.execute(
+        "ALTER TABLE shipment_event "
+        "RENAME CONSTRAINT shipment_event_flat_pkey TO shipment_event_pkey"
+    )
+    op.execute(
+        "ALTER TABLE shipment_event RENAME CONSTRAINT "
+        "shipment_event_flat_shipment_id_fkey TO shipment_event_shipment_id_fkey"
+    )
+    op.create_index(
+        "ix_shipment_event_shipment_id_created_at",
+        "shipment_event",
+        ["shipment_id", "created_at"],
+        unique=False,
+    )
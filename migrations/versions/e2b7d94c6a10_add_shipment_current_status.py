@@ -0,0 +1,59 @@
+"""add shipment current status
+
+Revision ID: e2b7d94c6a10
+Revises: c5e8a1f07b3d
+Create Date: 2026-10-17 13:08:22.730415
+
+"""
+from typing import Sequence, Union
+
+import sqlmodel
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = 'e2b7d94c6a10'
+down_revision: Union[str, Sequence[str], None] = 'c5e8a1f07b3d'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column(
+        "shipment",
+        sa.Column(
+            "current_status",
+            postgresql.ENUM(name="shipmentstatus", create_type=False),
+            nullable=True,
+        ),
+    )
+    op.add_column(
+        "shipment", sa.Column("current_location", sa.Integer(), nullable=True)
+    )
+    op.create_index(
+        op.f("ix_shipment_current_status"), "shipment", ["current_status"], unique=False
+    )
+    # Backfill from the latest event of each shipment
+    op.execute(
+        sa.text(
+            """
+            UPDATE shipment
+            SET current_status = latest.status, current_location = latest.location
+            FROM (
+                SELECT DISTINCT ON (shipment_id) shipment_id, status, location
+                FROM shipment_event
+                ORDER BY shipment_id, created_at DESC
+            ) AS latest
+            WHERE latest.shipment_id = shipment.id
+            """
+        )
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f("ix_shipment_current_status"), table_name="shipment")
+    op.drop_column("shipment", "current_location")
+    op.drop_column("shipment", "current_status")
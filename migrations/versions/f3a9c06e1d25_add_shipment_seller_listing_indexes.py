@@ -0,0 +1,41 @@
+"""add shipment seller listing indexes
+
+Revision ID: f3a9c06e1d25
+Revises: e2b7d94c6a10
+Create Date: 2026-10-17 14:37:05.281946
+
+"""
+from typing import Sequence, Union
+
+import sqlmodel
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f3a9c06e1d25'
+down_revision: Union[str, Sequence[str], None] = 'e2b7d94c6a10'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index(
+        "ix_shipment_seller_id_created_at",
+        "shipment",
+        ["seller_id", "created_at", "id"],
+        unique=False,
+    )
+    op.create_index(
+        "ix_shipment_seller_id_current_status_created_at",
+        "shipment",
+        ["seller_id", "current_status", "created_at", "id"],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_shipment_seller_id_current_status_created_at", table_name="shipment")
+    op.drop_index("ix_shipment_seller_id_created_at", table_name="shipment")
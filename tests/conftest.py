@@ -0,0 +1,154 @@
+import os
+
+# Settings are read on import, point them at local services unless set
+for name, value in {
+    "POSTGRES_SERVER": "localhost",
+    "POSTGRES_PORT": "5432",
+    "POSTGRES_USER": "postgres",
+    "POSTGRES_PASSWORD": "postgres",
+    "POSTGRES_DB": "fastship_test",
+    "REDIS_HOST": "localhost",
+    "REDIS_PORT": "6379",
+    "JWT_SECRET": "test-secret",
+    "JWT_ALGORITHM": "HS256",
+    "SECURITY_SALT": "test-salt",
+    "MAIL_USERNAME": "fastship",
+    "MAIL_PASSWORD": "fastship",
+    "MAIL_SERVER": "127.0.0.1",
+    "MAIL_PORT": "8025",
+    "MAIL_STARTTLS": "false",
+    "USE_CREDENTIALS": "false",
+    "MAIL_FROM": "noreply@example.com",
+    "MAIL_FROM_NAME": "FastShip",
+}.items():
+    os.environ.setdefault(name, value)
+
+import fakeredis
+import pytest
+from httpx import ASGITransport, AsyncClient
+from sqlalchemy import text
+
+from app.config import db_settings
+from app.database.coverage import zipcode_index
+from app.database.models import DeliveryPartner, Seller
+from app.database.partitions import shipment_event_partitions
+from app.database.principal import principal_cache
+from app.database.redis import redis_clients
+from app.database.session import async_session, create_db_tables, engine
+from app.database.tags import tag_registry
+from app.main import app
+from app.utils import (
+    _access_token_claims,
+    _access_token_digests,
+    generate_access_token,
+)
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture(autouse=True)
+def redis(monkeypatch) -> fakeredis.FakeServer:
+    """A fresh in-memory redis, shared by every client of the test"""
+    server = fakeredis.FakeServer()
+    clients = {}
+
+    monkeypatch.setattr(
+        redis_clients,
+        "get",
+        lambda db: clients.setdefault(
+            db, fakeredis.FakeAsyncRedis(server=server, db=db)
+        ),
+    )
+
+    # In-process caches would carry state over from other tests
+    principal_cache._local.clear()
+    _access_token_claims.clear()
+    _access_token_digests.clear()
+    zipcode_index.invalidate()
+    tag_registry._ids = {}
+
+    return server
+
+
+@pytest.fixture
+async def database():
+    """Empty tables in the test database, skips the test without postgres"""
+    if not db_settings.POSTGRES_DB.endswith("_test"):
+        pytest.skip("POSTGRES_DB must name a test database, its tables are dropped")
+
+    try:
+        async with engine.begin() as connection:
+            await connection.execute(text("DROP SCHEMA public CASCADE"))
+            await connection.execute(text("CREATE SCHEMA public"))
+    except OSError:
+        pytest.skip("postgres is not available")
+
+    await create_db_tables()
+    async with engine.begin() as connection:
+        await shipment_event_partitions.create(connection)
+
+    yield
+
+    # Connections belong to this test's event loop
+    await engine.dispose()
+
+
+@pytest.fixture
+async def client():
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url="http://test"
+    ) as client:
+        yield client
+
+
+class PlacedShipment:
+    def __init__(self, id: str, partner_id, seller_token: str, partner_token: str):
+        self.id = id
+        self.partner_id = partner_id
+        self.seller_headers = {"Authorization": f"Bearer {seller_token}"}
+        self.partner_headers = {"Authorization": f"Bearer {partner_token}"}
+
+
+@pytest.fixture
+async def shipment(database, client) -> PlacedShipment:
+    """A shipment placed through the api, with its seller's and partner's tokens"""
+    async with async_session() as session:
+        seller = Seller(
+            name="seller",
+            email="seller@example.com",
+            password_hash="-",
+            zip_code=11001,
+        )
+        partner = DeliveryPartner(
+            name="DHL",
+            email="dhl@example.com",
+            password_hash="-",
+            serviceable_zip_codes=[11002],
+            max_handling_capacity=10,
+        )
+        session.add_all([seller, partner])
+        await session.commit()
+
+    seller_token, partner_token = (
+        generate_access_token({"user": {"name": user.name, "id": str(user.id)}})
+        for user in (seller, partner)
+    )
+
+    response = await client.post(
+        "/shipment/",
+        json={
+            "content": "books",
+            "weight": 2,
+            "destination": 11002,
+            "client_contact_email": "client@example.com",
+        },
+        headers={"Authorization": f"Bearer {seller_token}"},
+    )
+    assert response.status_code == 201
+
+    return PlacedShipment(
+        response.json()["id"], partner.id, seller_token, partner_token
+    )
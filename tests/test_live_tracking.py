@@ -0,0 +1,138 @@
+"""Clients on the live tracking stream get every event of their shipment
+as it is committed, and leave the hub once they disconnect."""
+
+import asyncio
+import json
+from contextlib import suppress
+from uuid import UUID
+
+import pytest
+
+from app.config import db_settings
+from app.database.redis import (
+    TRACKING_CHANNEL,
+    listen_for_tracking_events,
+    redis_clients,
+    tracking_hub,
+)
+from app.main import app
+
+pytestmark = pytest.mark.anyio
+
+
+class StreamClient:
+    """Calls the app directly, the test client would wait for the stream to end"""
+
+    def __init__(self, path: str, query: str):
+        self.scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": "GET",
+            "scheme": "http",
+            "path": path,
+            "raw_path": path.encode(),
+            "query_string": query.encode(),
+            "headers": [(b"host", b"test")],
+            "client": ("127.0.0.1", 50000),
+            "server": ("test", 80),
+        }
+        self.messages: asyncio.Queue[dict] = asyncio.Queue()
+        self._disconnected = asyncio.Event()
+        self._requested = False
+
+    async def receive(self) -> dict:
+        if not self._requested:
+            self._requested = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+
+        await self._disconnected.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(self, message: dict):
+        await self.messages.put(message)
+
+    def open(self) -> asyncio.Task:
+        return asyncio.create_task(app(self.scope, self.receive, self.send))
+
+    def disconnect(self):
+        self._disconnected.set()
+
+    async def next_event(self) -> tuple[str, dict]:
+        while True:
+            message = await asyncio.wait_for(self.messages.get(), timeout=5)
+            body = message.get("body", b"").decode()
+
+            if body.startswith("event:"):
+                name, data = body.strip().split("\n")
+                return name.removeprefix("event: "), json.loads(
+                    data.removeprefix("data: ")
+                )
+
+
+async def wait_until(condition):
+    for _ in range(100):
+        if await condition():
+            return
+        await asyncio.sleep(0.05)
+
+    raise AssertionError("condition not met in time")
+
+
+@pytest.fixture
+async def listener():
+    task = asyncio.create_task(listen_for_tracking_events())
+    client = redis_clients.get(db_settings.REDIS_TRACKING_DB)
+
+    async def subscribed():
+        return dict(await client.pubsub_numsub(TRACKING_CHANNEL)).get(
+            TRACKING_CHANNEL.encode()
+        )
+
+    await wait_until(subscribed)
+    yield
+
+    task.cancel()
+    with suppress(asyncio.CancelledError):
+        await task
+
+
+async def test_stream_delivers_status_changes(client, shipment, listener):
+    stream = StreamClient("/shipment/track/stream", f"id={shipment.id}")
+    response = stream.open()
+
+    start = await asyncio.wait_for(stream.messages.get(), timeout=5)
+    assert start["status"] == 200
+    assert (b"content-type", b"text/event-stream; charset=utf-8") in start["headers"]
+
+    async def tracked():
+        return shipment.id in tracking_hub._queues
+
+    await wait_until(tracked)
+
+    # Published by ShipmentEventService._publish once the event commits
+    update = await client.patch(
+        "/shipment/",
+        params={"id": shipment.id},
+        json={"status": "in_transit", "location": 11003},
+        headers=shipment.partner_headers,
+    )
+    assert update.status_code == 200
+
+    name, event = await stream.next_event()
+    assert name == "timeline"
+    assert UUID(event["shipment_id"]) == UUID(shipment.id)
+    assert (event["status"], event["location"]) == ("in_transit", 11003)
+
+    stream.disconnect()
+    await asyncio.wait_for(response, timeout=5)
+
+    assert shipment.id not in tracking_hub._queues
+
+
+async def test_stream_of_unknown_shipment_is_not_found(client, database):
+    response = await client.get(
+        "/shipment/track/stream", params={"id": "00000000-0000-0000-0000-000000000000"}
+    )
+
+    assert response.status_code == 404
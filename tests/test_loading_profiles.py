@@ -0,0 +1,185 @@
+"""Every read declares the relationships it loads. These tests fail once a
+request loads more rows, or runs more statements, than its profile allows."""
+
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from uuid import UUID
+
+import pytest
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+
+from app.api.dependencies import get_current_seller
+from app.database.models import (
+    DeliveryPartner,
+    Seller,
+    Shipment,
+    ShipmentEvent,
+    ShipmentStatus,
+    ShipmentTag,
+    Tag,
+    TagName,
+)
+from app.database.session import async_session, engine
+from app.utils import decode_access_token, generate_access_token
+
+pytestmark = pytest.mark.anyio
+
+SHIPMENTS = 3
+EVENTS_PER_SHIPMENT = 4
+
+
+class Usage:
+    def __init__(self):
+        self.statements = 0
+        self.rows = 0
+
+
+@contextmanager
+def measure():
+    """Count statements sent and ORM rows loaded inside the block"""
+    usage = Usage()
+
+    def count_statement(*args):
+        usage.statements += 1
+
+    def count_row(session, instance):
+        usage.rows += 1
+
+    event.listen(engine.sync_engine, "before_cursor_execute", count_statement)
+    event.listen(Session, "loaded_as_persistent", count_row)
+    try:
+        yield usage
+    finally:
+        event.remove(engine.sync_engine, "before_cursor_execute", count_statement)
+        event.remove(Session, "loaded_as_persistent", count_row)
+
+
+@pytest.fixture
+async def seller(database) -> Seller:
+    """A seller with tagged shipments, next to another seller's shipments
+    with the same partner that no profile of this seller may load"""
+    async with async_session() as session:
+        tags = [
+            Tag(name=TagName.EXPRESS, instruction="deliver first"),
+            Tag(name=TagName.FRAGILE, instruction="handle with care"),
+        ]
+        partner = DeliveryPartner(
+            name="DHL",
+            email="dhl@example.com",
+            password_hash="-",
+            serviceable_zip_codes=[11001],
+            max_handling_capacity=100,
+        )
+        seller, other_seller = (
+            Seller(name=name, email=f"{name}@example.com", password_hash="-")
+            for name in ("seller", "other")
+        )
+        session.add_all([*tags, partner, seller, other_seller])
+        await session.flush()
+
+        for owner in (seller, other_seller):
+            for _ in range(SHIPMENTS):
+                shipment = Shipment(
+                    content="books",
+                    weight=2,
+                    destination=11001,
+                    client_contact_email="client@example.com",
+                    client_contact_phone=None,
+                    estimated_delivery=datetime.now() + timedelta(days=3),
+                    current_status=ShipmentStatus.in_transit,
+                    current_location=11001,
+                    seller_id=owner.id,
+                    delivery_partner_id=partner.id,
+                )
+                session.add(shipment)
+                await session.flush()
+
+                session.add_all(
+                    ShipmentEvent(
+                        created_at=datetime.now() + timedelta(minutes=minute),
+                        location=11001,
+                        status=ShipmentStatus.in_transit,
+                        shipment_id=shipment.id,
+                    )
+                    for minute in range(EVENTS_PER_SHIPMENT)
+                )
+                session.add_all(
+                    ShipmentTag(shipment_id=shipment.id, tag_id=tag.id) for tag in tags
+                )
+
+        await session.commit()
+
+        return seller
+
+
+@pytest.fixture
+def token(seller: Seller) -> str:
+    return generate_access_token({"user": {"name": seller.name, "id": str(seller.id)}})
+
+
+async def _shipment_id(seller: Seller) -> UUID:
+    async with async_session() as session:
+        return await session.scalar(
+            select(Shipment.id).where(Shipment.seller_id == seller.id).limit(1)
+        )
+
+
+async def test_current_seller_loads_only_the_seller(seller, token):
+    async with async_session() as session:
+        with measure() as usage:
+            principal = await get_current_seller(decode_access_token(token), session)
+
+    assert principal.id == seller.id
+    assert (usage.statements, usage.rows) == (1, 1)
+
+    # Served from the principal cache afterwards
+    async with async_session() as session:
+        with measure() as usage:
+            await get_current_seller(decode_access_token(token), session)
+
+    assert (usage.statements, usage.rows) == (0, 0)
+
+
+async def test_get_shipment_loads_its_timeline_and_tags(seller, token, client):
+    id = await _shipment_id(seller)
+
+    with measure() as usage:
+        response = await client.get(
+            "/shipment/",
+            params={"id": str(id)},
+            headers={"Authorization": f"Bearer {token}"},
+        )
+
+    assert response.status_code == 200
+    assert len(response.json()["timeline"]) == EVENTS_PER_SHIPMENT
+    # Seller, version, shipment, timeline, tags
+    assert usage.statements <= 5
+    assert usage.rows <= 1 + 1 + EVENTS_PER_SHIPMENT + 2
+
+
+async def test_tracking_loads_its_timeline_and_partner(seller, client):
+    id = await _shipment_id(seller)
+
+    with measure() as usage:
+        response = await client.get("/shipment/track", params={"id": str(id)})
+
+    assert response.status_code == 200
+    # Version, shipment, timeline, partner
+    assert usage.statements <= 4
+    assert usage.rows <= 1 + EVENTS_PER_SHIPMENT + 1
+
+
+@pytest.mark.parametrize("stream", [False, True])
+async def test_tagged_loads_only_the_sellers_page(seller, token, client, stream):
+    with measure() as usage:
+        response = await client.get(
+            "/shipment/tagged",
+            params={"tag_name": TagName.EXPRESS.value, "stream": stream},
+            headers={"Authorization": f"Bearer {token}"},
+        )
+
+    assert response.status_code == 200
+    # Seller, tag ids, shipments, timelines, tags
+    assert usage.statements <= 5
+    assert usage.rows <= 1 + SHIPMENTS * (1 + EVENTS_PER_SHIPMENT + 2)
@@ -0,0 +1,123 @@
+"""Requests that send email return without waiting on the mail server.
+
+A local smtp server answers every message slowly. A celery worker on an
+in-memory broker still has to deliver each one to it.
+"""
+
+import asyncio
+from time import perf_counter
+
+import pytest
+from aiosmtpd.controller import Controller
+from celery.contrib.testing.worker import start_worker
+
+from app.config import notification_settings
+from app.database.models import DeliveryPartner, Seller
+from app.database.session import async_session
+from app.services.outbox import OutboxService
+from app.utils import generate_access_token
+from app.worker.tasks import app as celery_app
+
+pytestmark = pytest.mark.anyio
+
+# Seconds the mail server takes to accept a message
+MAIL_LATENCY = 2
+
+
+class SlowMailServer:
+    def __init__(self):
+        self.recipients: list[str] = []
+
+    async def handle_DATA(self, server, session, envelope):
+        await asyncio.sleep(MAIL_LATENCY)
+        self.recipients.extend(envelope.rcpt_tos)
+        return "250 Message accepted for delivery"
+
+    async def wait_for(self, recipient: str):
+        for _ in range(MAIL_LATENCY * 50):
+            if recipient in self.recipients:
+                return
+            await asyncio.sleep(0.1)
+
+        raise AssertionError(f"no email delivered to {recipient}")
+
+
+@pytest.fixture
+def mail_server() -> SlowMailServer:
+    handler = SlowMailServer()
+    controller = Controller(
+        handler,
+        hostname=notification_settings.MAIL_SERVER,
+        port=notification_settings.MAIL_PORT,
+    )
+
+    controller.start()
+    yield handler
+    controller.stop()
+
+
+@pytest.fixture
+def worker(monkeypatch):
+    monkeypatch.setattr(celery_app.conf, "broker_url", "memory://")
+
+    with start_worker(celery_app, pool="solo", perform_ping_check=False):
+        yield
+
+
+async def test_signup_does_not_wait_on_mail(database, client, mail_server, worker):
+    start = perf_counter()
+    response = await client.post(
+        "/seller/signup",
+        json={"name": "seller", "email": "seller@example.com", "password": "secret"},
+    )
+    latency = perf_counter() - start
+
+    assert response.status_code == 200
+    assert latency < MAIL_LATENCY / 2
+
+    await mail_server.wait_for("seller@example.com")
+
+
+async def test_shipment_does_not_wait_on_mail(database, client, mail_server, worker):
+    async with async_session() as session:
+        seller = Seller(
+            name="seller",
+            email="seller@example.com",
+            password_hash="-",
+            zip_code=11001,
+        )
+        partner = DeliveryPartner(
+            name="DHL",
+            email="dhl@example.com",
+            password_hash="-",
+            serviceable_zip_codes=[11002],
+            max_handling_capacity=10,
+        )
+        session.add_all([seller, partner])
+        await session.commit()
+
+    token = generate_access_token({"user": {"name": seller.name, "id": str(seller.id)}})
+
+    start = perf_counter()
+    response = await client.post(
+        "/shipment/",
+        json={
+            "content": "books",
+            "weight": 2,
+            "destination": 11002,
+            "client_contact_email": "client@example.com",
+        },
+        headers={"Authorization": f"Bearer {token}"},
+    )
+    latency = perf_counter() - start
+
+    assert response.status_code == 201
+    assert latency < MAIL_LATENCY / 2
+
+    # The placed email waits in the outbox until relayed to the worker
+    async with async_session() as session:
+        start = perf_counter()
+        assert await OutboxService(session).relay(batch_size=10) == 1
+        assert perf_counter() - start < MAIL_LATENCY / 2
+
+    await mail_server.wait_for("client@example.com")
@@ -0,0 +1,82 @@
+"""A delivery partner's active shipment count follows the status of its
+shipments, also when they change from two requests at once."""
+
+import asyncio
+
+import pytest
+
+from app.database.models import DeliveryPartner
+from app.database.session import async_session
+from app.services.shipment_event import ShipmentEventService
+
+pytestmark = pytest.mark.anyio
+
+
+async def active_shipment_count(partner_id) -> int:
+    async with async_session() as session:
+        partner = await session.get(DeliveryPartner, partner_id)
+        return partner.active_shipment_count
+
+
+async def test_placed_shipment_counts_as_active(shipment):
+    assert await active_shipment_count(shipment.partner_id) == 1
+
+
+async def test_delivered_and_cancelled_at_once_release_once(
+    client, shipment, monkeypatch
+):
+    change_partner_load = ShipmentEventService._change_partner_load
+
+    async def slow_change_partner_load(self, partner_id, change):
+        # Widens the window between reading the status and counting it
+        await asyncio.sleep(0.2)
+        await change_partner_load(self, partner_id, change)
+
+    monkeypatch.setattr(
+        ShipmentEventService, "_change_partner_load", slow_change_partner_load
+    )
+
+    delivered, cancelled = await asyncio.gather(
+        client.patch(
+            "/shipment/",
+            params={"id": shipment.id},
+            json={"status": "delivered"},
+            headers=shipment.partner_headers,
+        ),
+        client.get(
+            "/shipment/cancel",
+            params={"id": shipment.id},
+            headers=shipment.seller_headers,
+        ),
+    )
+
+    assert delivered.status_code == 200
+    # Refused if the shipment was delivered first
+    assert cancelled.status_code in (200, 409)
+    assert await active_shipment_count(shipment.partner_id) == 0
+
+
+async def test_cannot_cancel_delivered_shipment(client, shipment):
+    response = await client.patch(
+        "/shipment/",
+        params={"id": shipment.id},
+        json={"status": "delivered"},
+        headers=shipment.partner_headers,
+    )
+    assert response.status_code == 200
+
+    response = await client.get(
+        "/shipment/cancel",
+        params={"id": shipment.id},
+        headers=shipment.seller_headers,
+    )
+    assert response.status_code == 409
+
+    response = await client.get(
+        "/shipment/", params={"id": shipment.id}, headers=shipment.seller_headers
+    )
+    assert [event["status"] for event in response.json()["timeline"]] == [
+        "placed",
+        "delivered",
+    ]
+    assert await active_shipment_count(shipment.partner_id) == 0
@@ -0,0 +1,138 @@
+from typing import Annotated
+
+import pytest
+from fastapi import Depends, FastAPI, Form
+from httpx import ASGITransport, AsyncClient
+
+from app.api.dependencies import RateLimit
+from app.core.exceptions import add_exception_handlers
+from app.database import redis
+from app.database.redis import hit_rate_limits
+
+pytestmark = pytest.mark.anyio
+
+WINDOW = 60
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch) -> Clock:
+    clock = Clock()
+    monkeypatch.setattr(redis, "time", clock)
+    return clock
+
+
+@pytest.fixture
+def app() -> FastAPI:
+    app = FastAPI()
+    add_exception_handlers(app)
+
+    @app.post(
+        "/token",
+        dependencies=[
+            Depends(RateLimit("token", per_ip=4, per_email=2, window=WINDOW))
+        ],
+    )
+    async def token(username: Annotated[str, Form()]):
+        return {"username": username}
+
+    return app
+
+
+def client_from(app: FastAPI, ip: str) -> AsyncClient:
+    return AsyncClient(
+        transport=ASGITransport(app=app, client=(ip, 50000)), base_url="http://test"
+    )
+
+
+async def test_hits_are_allowed_up_to_the_limit(clock):
+    for _ in range(3):
+        assert await hit_rate_limits([("key", 3)], WINDOW) == 0
+        clock.now += 10
+
+    # Until the oldest of the last 3 hits leaves the window
+    assert await hit_rate_limits([("key", 3)], WINDOW) == 40
+
+
+async def test_rejected_hits_count_against_the_window(clock):
+    for _ in range(3):
+        await hit_rate_limits([("key", 3)], WINDOW)
+        clock.now += 10
+
+    retry_after = await hit_rate_limits([("key", 3)], WINDOW)
+
+    clock.now += retry_after - 1
+    assert await hit_rate_limits([("key", 3)], WINDOW) > 0
+
+    # Retrying early pushed the next allowed hit back
+    clock.now += 1
+    assert await hit_rate_limits([("key", 3)], WINDOW) > 0
+
+
+async def test_allowed_again_after_retry_after(clock):
+    for _ in range(3):
+        await hit_rate_limits([("key", 3)], WINDOW)
+        clock.now += 10
+
+    clock.now += await hit_rate_limits([("key", 3)], WINDOW)
+
+    assert await hit_rate_limits([("key", 3)], WINDOW) == 0
+
+
+async def test_longest_wait_of_all_limits_is_returned(clock):
+    await hit_rate_limits([("short", 1)], WINDOW)
+    clock.now += 30
+    await hit_rate_limits([("long", 1)], WINDOW)
+
+    assert await hit_rate_limits([("short", 1), ("long", 1)], WINDOW) == WINDOW
+
+
+async def test_too_many_requests_with_retry_after(app, clock):
+    async with client_from(app, "10.0.0.1") as client:
+        for _ in range(2):
+            response = await client.post("/token", data={"username": "a@example.com"})
+            assert response.status_code == 200
+
+        response = await client.post("/token", data={"username": "a@example.com"})
+
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == str(WINDOW)
+
+
+async def test_email_limit_applies_across_ips(app, clock):
+    async with client_from(app, "10.0.0.1") as first, client_from(
+        app, "10.0.0.2"
+    ) as second:
+        await first.post("/token", data={"username": "a@example.com"})
+        await first.post("/token", data={"username": "A@example.com"})
+
+        response = await second.post("/token", data={"username": "a@example.com"})
+        assert response.status_code == 429
+
+        # The ip of the first client still has room for other emails
+        response = await first.post("/token", data={"username": "b@example.com"})
+        assert response.status_code == 200
+
+
+async def test_ip_limit_applies_across_emails(app, clock):
+    async with client_from(app, "10.0.0.1") as first, client_from(
+        app, "10.0.0.2"
+    ) as second:
+        for index in range(4):
+            response = await first.post(
+                "/token", data={"username": f"{index}@example.com"}
+            )
+            assert response.status_code == 200
+
+        response = await first.post("/token", data={"username": "new@example.com"})
+        assert response.status_code == 429
+
+        response = await second.post("/token", data={"username": "new@example.com"})
+        assert response.status_code == 200
@@ -0,0 +1,118 @@
+"""Shipment reads carry the shipment's version as ETag. A client sending it
+back gets 304 until the shipment, its timeline or its tags change."""
+
+from uuid import UUID
+
+import pytest
+from sqlalchemy import update
+
+from app.config import db_settings
+from app.database.models import Shipment
+from app.database.redis import _shipment_key, redis_clients
+from app.database.session import async_session
+
+pytestmark = pytest.mark.anyio
+
+
+def response_cache():
+    return redis_clients.get(db_settings.REDIS_RESPONSE_CACHE_DB)
+
+
+async def read(client, shipment, etag: str | None = None):
+    headers = dict(shipment.seller_headers)
+    if etag is not None:
+        headers["If-None-Match"] = etag
+
+    return await client.get("/shipment/", params={"id": shipment.id}, headers=headers)
+
+
+async def test_matching_etag_is_not_modified(client, shipment):
+    response = await read(client, shipment)
+    etag = response.headers["ETag"]
+
+    assert response.status_code == 200
+    assert response.headers["Cache-Control"] == "no-cache"
+    assert "Last-Modified" in response.headers
+
+    response = await read(client, shipment, etag)
+
+    assert response.status_code == 304
+    assert response.headers["ETag"] == etag
+    assert response.content == b""
+
+    # Weak and listed tags match too
+    response = await read(client, shipment, f'"0", W/{etag}')
+    assert response.status_code == 304
+
+
+async def test_rendered_read_is_cached_per_version(client, shipment):
+    response = await read(client, shipment)
+    version = response.headers["ETag"].strip('"')
+
+    cached = await response_cache().hget(
+        _shipment_key(shipment.id, version, "read"), "body"
+    )
+    assert cached == response.content
+
+    assert (await read(client, shipment)).content == response.content
+
+
+async def test_update_changes_etag(client, shipment):
+    etag = (await read(client, shipment)).headers["ETag"]
+
+    response = await client.patch(
+        "/shipment/",
+        params={"id": shipment.id},
+        json={"status": "in_transit"},
+        headers=shipment.partner_headers,
+    )
+    assert response.status_code == 200
+
+    response = await read(client, shipment, etag)
+    updated_etag = response.headers["ETag"]
+
+    assert response.status_code == 200
+    assert updated_etag != etag
+    assert response.json()["timeline"][-1]["status"] == "in_transit"
+
+    response = await client.patch(
+        "/shipment/batch",
+        json=[{"id": shipment.id, "location": 11003}],
+        headers=shipment.partner_headers,
+    )
+    assert response.status_code == 200
+
+    response = await read(client, shipment, updated_etag)
+
+    assert response.status_code == 200
+    assert response.headers["ETag"] not in (etag, updated_etag)
+    assert response.json()["timeline"][-1]["location"] == 11003
+
+
+async def test_missing_cached_version_is_read_from_database(client, shipment):
+    etag = (await read(client, shipment)).headers["ETag"]
+    version_key = _shipment_key(shipment.id, "version")
+
+    # Expired, or lost with redis
+    await response_cache().delete(version_key)
+
+    response = await read(client, shipment, etag)
+
+    assert response.status_code == 304
+    assert response.headers["ETag"] == etag
+    assert await response_cache().exists(version_key)
+
+    # A change redis never heard of is still seen once the version expires
+    async with async_session() as session:
+        await session.execute(
+            update(Shipment)
+            .where(Shipment.id == UUID(shipment.id))
+            .values(version=Shipment.version + 1)
+        )
+        await session.commit()
+    await response_cache().delete(version_key)
+
+    response = await read(client, shipment, etag)
+
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag